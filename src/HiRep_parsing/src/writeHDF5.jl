@@ -1,6 +1,8 @@
+function trajectory_indices(names)
+    return parse.(Int, last.(split.(names, "n")))
+end
 function permutation_names(names)
-    numbers = parse.(Int, last.(split.(names, "n")))
-    return sortperm(numbers)
+    return sortperm(trajectory_indices(names))
 end
 function _write_lattice_setup(file, h5file; mixed_rep = false, h5group = "", sort = false)
     plaq = plaquettes(file)
@@ -9,6 +11,11 @@ function _write_lattice_setup(file, h5file; mixed_rep = false, h5group = "", sor
     # save other relevant quantities
     h5write(h5file, joinpath(h5group, "plaquette"), plaq[perm])
     h5write(h5file, joinpath(h5group, "configurations"), names[perm])
+    h5write(
+        h5file,
+        joinpath(h5group, "trajectory indices"),
+        trajectory_indices(names)[perm],
+    )
     h5write(h5file, joinpath(h5group, "gauge group"), gaugegroup(file))
     h5write(h5file, joinpath(h5group, "beta"), inverse_coupling(file))
     h5write(h5file, joinpath(h5group, "lattice"), latticesize(file))
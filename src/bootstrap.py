@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 
 import hashlib
+import logging
+import math
 import numpy as np
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 from flow_analysis.stats.bootstrap import (
     basic_bootstrap,
@@ -14,72 +19,377 @@ from flow_analysis.stats.bootstrap import (
 from uncertainties import ufloat
 
 
-def get_rng(name):
+def name_seed(name):
     filename = name.strip("/")
     filename_hash = hashlib.md5(filename.encode("utf8")).digest()
-    seed = abs(int.from_bytes(filename_hash, "big"))
-    return np.random.default_rng(seed)
+    return abs(int.from_bytes(filename_hash, "big"))
+
+
+def get_rng(name):
+    return np.random.default_rng(name_seed(name))
+
+
+# Number of bootstrap replicas drawn from each child random number stream
+BOOTSTRAP_CHUNK_SIZE = 50
+
+
+def get_bootstrap_num_workers(num_workers=None):
+    """
+    Number of threads to use to generate bootstrap replicas.
+    Taken from the BOOTSTRAP_NUM_WORKERS environment variable if not given.
+    """
+    if num_workers is None:
+        num_workers = int(os.environ.get("BOOTSTRAP_NUM_WORKERS", 1))
+    return max(num_workers, 1)
+
+
+def generate_bootstrap_chunks(name, generate, num_workers=None):
+    """
+    Generate BOOTSTRAP_SAMPLE_COUNT bootstrap replicas
+    in chunks of BOOTSTRAP_CHUNK_SIZE,
+    calling generate(rng, chunk_size) for each chunk
+    and concatenating the results along the first axis.
+    Each chunk draws from its own child of a SeedSequence seeded from name,
+    so chunks may be generated in parallel on a thread pool,
+    and the result does not depend on the number of workers.
+    """
+    chunk_sizes = [
+        min(BOOTSTRAP_CHUNK_SIZE, BOOTSTRAP_SAMPLE_COUNT - start)
+        for start in range(0, BOOTSTRAP_SAMPLE_COUNT, BOOTSTRAP_CHUNK_SIZE)
+    ]
+    rngs = [
+        np.random.default_rng(seed_sequence)
+        for seed_sequence in np.random.SeedSequence(name_seed(name)).spawn(
+            len(chunk_sizes)
+        )
+    ]
+
+    num_workers = get_bootstrap_num_workers(num_workers)
+    if num_workers == 1:
+        chunks = list(map(generate, rngs, chunk_sizes))
+    else:
+        with ThreadPoolExecutor(num_workers) as executor:
+            chunks = list(executor.map(generate, rngs, chunk_sizes))
+    return np.concatenate(chunks)
+
+
+def expression_key(operand):
+    """
+    Structural key of an operand of a lazy BootstrapSampleSet,
+    used to recognise common subexpressions.
+    """
+    if isinstance(operand, BootstrapSampleSet):
+        if operand._expression is not None:
+            return operand._expression[2]
+        return ("set", id(operand))
+    if isinstance(operand, (int, float, np.generic)):
+        return ("constant", type(operand), operand)
+    return ("constant", id(operand))
+
+
+def count_uses(operand, uses):
+    """Count how many times each subexpression is used within a graph."""
+    if not isinstance(operand, BootstrapSampleSet) or operand._expression is None:
+        return
+    for child in operand._expression[1]:
+        key = expression_key(child)
+        uses[key] = uses.get(key, 0) + 1
+        if uses[key] == 1:
+            count_uses(child, uses)
+
+
+def leaf_dtypes(operand):
+    if not isinstance(operand, BootstrapSampleSet):
+        return []
+    if operand._expression is None:
+        return [operand._samples.dtype]
+    return [dtype for child in operand._expression[1] for dtype in leaf_dtypes(child)]
+
+
+def evaluate_expression(operand, values, uses):
+    """
+    Evaluate the graph below operand, returning its mean and samples,
+    and whether the samples are a temporary owned by this evaluation.
+    Each distinct subexpression is evaluated once,
+    and temporaries used only once are overwritten in place.
+    """
+    key = expression_key(operand)
+    if key in values:
+        return values[key]
+
+    if not isinstance(operand, BootstrapSampleSet):
+        value = operand, operand, False
+    elif operand._expression is None:
+        value = operand._mean, operand._samples, False
+    elif operand._expression[0] is None:
+        # A lazy view of a set that is not itself lazy
+        (child,) = operand._expression[1]
+        value = child.mean, child.samples, False
+    else:
+        function, operands, _ = operand._expression
+        means, samples, temporaries = zip(
+            *[evaluate_expression(child, values, uses) for child in operands]
+        )
+
+        out = None
+        result_shape = np.broadcast_shapes(*map(np.shape, samples))
+        result_dtype = np.result_type(*samples)
+        for child, child_samples, temporary in zip(operands, samples, temporaries):
+            if (
+                temporary
+                and uses[expression_key(child)] == 1
+                and child_samples.shape == result_shape
+                and child_samples.dtype == result_dtype
+            ):
+                out = child_samples
+                break
+
+        value = function(*means), function(*samples, out=out), True
+
+    values[key] = value
+    return value
+
+
+def check_same_resampling(sets):
+    """
+    The common type of the sample sets sets (None if there are none).
+    Raises TypeError if they come from different resamplings,
+    as samples are then unrelated and cannot be combined.
+    The choice of resampling must therefore be applied throughout an analysis;
+    in particular, the plaquette can only be bootstrapped or Poisson bootstrapped.
+    """
+    set_types = {type(sample_set) for sample_set in sets}
+    if len(set_types) > 1:
+        raise TypeError(
+            "Cannot combine sample sets from different resamplings: "
+            + ", ".join(sorted(set_type.__name__ for set_type in set_types))
+        )
+    return next(iter(set_types), None)
+
+
+def apply_elementwise(function, *operands):
+    """
+    Apply the ufunc function to the means and samples of operands,
+    which may be BootstrapSampleSets or plain values.
+    If any operand is lazy, the result is too.
+    """
+    sets = [operand for operand in operands if isinstance(operand, BootstrapSampleSet)]
+    set_type = check_same_resampling(sets)
+
+    if any(operand._expression is not None for operand in sets):
+        return set_type.deferred(function, operands)
+
+    dtype = None
+    if all(operand.samples.dtype == np.float32 for operand in sets):
+        dtype = np.float32
+    result = set_type(
+        function(
+            *[
+                operand.mean if isinstance(operand, BootstrapSampleSet) else operand
+                for operand in operands
+            ]
+        ),
+        function(
+            *[
+                operand.samples if isinstance(operand, BootstrapSampleSet) else operand
+                for operand in operands
+            ]
+        ),
+        dtype=dtype,
+    )
+    # The samples were freshly computed, so may be updated in place later
+    result._owns_samples = True
+    return result
 
 
 class BootstrapSampleSet:
-    def __init__(self, mean, samples):
-        self.mean = mean
+    """
+    The central value and bootstrap samples of an observable.
+    Samples are stored as given (usually float64);
+    passing dtype=np.float32 halves their memory footprint,
+    and is preserved by arithmetic with other float32 sets or with scalars.
+    Reductions such as std() always accumulate in float64.
+
+    Arithmetic on a set obtained from lazy() does not compute anything,
+    but builds an expression graph; this is evaluated in a single pass,
+    reusing temporaries and common subexpressions,
+    once the mean or samples of the result are first needed.
+    """
+
+    __slots__ = ("_mean", "_samples", "_expression", "_owns_samples")
+    fixed_sample_count = True
+
+    def __init__(self, mean, samples, dtype=None):
+        self._expression = None
+        self._mean = mean
 
         if samples is None or len(samples) == 0:
-            self.samples = np.ones(BOOTSTRAP_SAMPLE_COUNT) * np.nan
-        elif len(samples) != BOOTSTRAP_SAMPLE_COUNT:
+            self._samples = np.ones(BOOTSTRAP_SAMPLE_COUNT, dtype=dtype) * np.nan
+        elif self.fixed_sample_count and len(samples) != BOOTSTRAP_SAMPLE_COUNT:
             raise ValueError("Bootstrap sample count mismatch")
         else:
-            self.samples = np.asarray(samples)
+            self._samples = np.asarray(samples, dtype=dtype)
+        # An array passed in may be shared with the caller
+        self._owns_samples = self._samples is not samples
 
-    def __add__(self, other):
+    @classmethod
+    def deferred(cls, function, operands):
+        result = cls.__new__(cls)
+        result._mean = result._samples = None
+        result._owns_samples = False
+        result._expression = (
+            function,
+            operands,
+            (function, *map(expression_key, operands)),
+        )
+        return result
+
+    def lazy(self):
+        """A lazily-evaluated view of this set, for building up expressions."""
+        if self._expression is not None:
+            return self
+        result = type(self).deferred(None, (self,))
+        result._expression = (None, (self,), expression_key(self))
+        return result
+
+    def evaluate(self):
+        """Compute the mean and samples of a lazy set, if not already done."""
+        if self._expression is None:
+            return self
+
+        uses = {}
+        count_uses(self, uses)
+        dtypes = leaf_dtypes(self)
+        mean, samples, temporary = evaluate_expression(self, {}, uses)
+        if not temporary:
+            samples = samples.copy()
+
+        self._mean = mean
+        self._samples = np.asarray(
+            samples,
+            dtype=(
+                np.float32
+                if all(dtype == np.float32 for dtype in dtypes)
+                else samples.dtype
+            ),
+        )
+        self._owns_samples = True
+        self._expression = None
+        return self
+
+    @property
+    def mean(self):
+        return self.evaluate()._mean
+
+    @mean.setter
+    def mean(self, value):
+        self.evaluate()._mean = value
+
+    @property
+    def samples(self):
+        return self.evaluate()._samples
+
+    @samples.setter
+    def samples(self, value):
+        self.evaluate()._samples = value
+        self._owns_samples = False
+
+    def storage_dtype(self, other=None):
+        """float32 if this set (and other, if it is a set) are stored as such."""
+        dtypes = [self.samples.dtype]
         if isinstance(other, BootstrapSampleSet):
-            return BootstrapSampleSet(
-                self.mean + other.mean, self.samples + other.samples
+            dtypes.append(other.samples.dtype)
+        if all(dtype == np.float32 for dtype in dtypes):
+            return np.float32
+        return None
+
+    def astype(self, dtype):
+        return type(self)(self.mean, self.samples, dtype=dtype)
+
+    def _inplace(self, operation, other):
+        """
+        Apply operation to self and other, writing the samples
+        into the existing array where its shape and type allow.
+        Only arrays that the set allocated itself (as the result of
+        arithmetic or evaluation) are written to; previously an array passed
+        to the constructor was too, changing data shared with the caller.
+        Such arrays are replaced instead.
+        Lazy sets instead extend their expression.
+        """
+        if isinstance(other, BootstrapSampleSet):
+            check_same_resampling([self, other])
+
+        if self._expression is not None or (
+            isinstance(other, BootstrapSampleSet) and other._expression is not None
+        ):
+            return apply_elementwise(operation, self, other)
+
+        if isinstance(other, BootstrapSampleSet):
+            other_mean, other_samples = other.mean, other.samples
+        else:
+            other_mean, other_samples = other, other
+
+        self.mean = operation(self.mean, other_mean)
+        if (
+            np.issubdtype(self.samples.dtype, np.floating)
+            and self._owns_samples
+            and self.samples.flags.writeable
+            and np.broadcast_shapes(self.samples.shape, np.shape(other_samples))
+            == self.samples.shape
+        ):
+            operation(
+                self.samples, other_samples, out=self.samples, casting="same_kind"
             )
         else:
-            return BootstrapSampleSet(self.mean + other, self.samples + other)
+            self.samples = np.asarray(
+                operation(self.samples, other_samples), dtype=self.storage_dtype(other)
+            )
+            self._owns_samples = True
+        return self
+
+    def __add__(self, other):
+        return apply_elementwise(np.add, self, other)
 
     def __radd__(self, other):
-        return self + other
+        return apply_elementwise(np.add, other, self)
+
+    def __iadd__(self, other):
+        return self._inplace(np.add, other)
 
     def __sub__(self, other):
-        if isinstance(other, BootstrapSampleSet):
-            return BootstrapSampleSet(
-                self.mean - other.mean, self.samples - other.samples
-            )
-        else:
-            return BootstrapSampleSet(self.mean - other, self.samples - other)
+        return apply_elementwise(np.subtract, self, other)
 
     def __rsub__(self, other):
-        return self - other
+        return apply_elementwise(np.subtract, other, self)
+
+    def __isub__(self, other):
+        return self._inplace(np.subtract, other)
 
     def __mul__(self, other):
-        if isinstance(other, BootstrapSampleSet):
-            return BootstrapSampleSet(
-                self.mean * other.mean, self.samples * other.samples
-            )
-        else:
-            return BootstrapSampleSet(self.mean * other, self.samples * other)
+        return apply_elementwise(np.multiply, self, other)
 
     def __rmul__(self, other):
-        return self * other
+        return apply_elementwise(np.multiply, other, self)
+
+    def __imul__(self, other):
+        return self._inplace(np.multiply, other)
 
     def __truediv__(self, other):
-        if isinstance(other, BootstrapSampleSet):
-            return BootstrapSampleSet(
-                self.mean / other.mean, self.samples / other.samples
-            )
-        else:
-            return BootstrapSampleSet(self.mean / other, self.samples / other)
+        return apply_elementwise(np.true_divide, self, other)
 
     def __rtruediv__(self, other):
-        return BootstrapSampleSet(other / self.mean, other / self.samples)
+        return apply_elementwise(np.true_divide, other, self)
+
+    def __itruediv__(self, other):
+        return self._inplace(np.true_divide, other)
 
     def __pow__(self, exponent, mod=None):
         if mod is not None:
             raise NotImplementedError("Ternary pow() is not implemented.")
-        return BootstrapSampleSet(self.mean**exponent, self.samples**exponent)
+        return apply_elementwise(np.power, self, exponent)
+
+    def __ipow__(self, exponent):
+        return self._inplace(np.power, exponent)
 
     def __repr__(self):
         return f"BootstrapSampleSet[mean={self.mean}, std={self.std()}]"
@@ -88,23 +398,30 @@ class BootstrapSampleSet:
         return f"{{:{format_spec}}}".format(self.to_ufloat())
 
     def __getitem__(self, key):
-        return BootstrapSampleSet(self.mean[key], self.samples[:, key])
+        return type(self)(self.mean[key], self.samples[:, key])
 
     def log(self):
-        return BootstrapSampleSet(np.log(self.mean), np.log(self.samples))
+        return apply_elementwise(np.log, self)
 
     def arccosh(self):
-        return BootstrapSampleSet(np.arccosh(self.mean), np.arccosh(self.samples))
+        return apply_elementwise(np.arccosh, self)
 
     def std(self):
-        return self.samples.std(axis=0)
+        return self.samples.std(axis=0, dtype=np.float64)
+
+    def covariance(self):
+        """Covariance matrix of a one-dimensional set, estimated from the samples."""
+        return np.cov(self.samples.T)
 
     def weighted_mean(self):
         """
         Compute the mean along the non-bootstrap dimension of a multidimensional
         BootstrapSampleSet, weighted by the uncertainties.
         """
-        return BootstrapSampleSet(self.samples.mean(), self.samples.mean(axis=1))
+        return type(self)(
+            self.samples.mean(dtype=np.float64),
+            self.samples.mean(axis=1, dtype=np.float64),
+        )
 
     def to_ufloat(self):
         if isinstance(self.mean, np.ndarray):
@@ -113,6 +430,149 @@ class BootstrapSampleSet:
             return ufloat(self.mean, self.std())
 
 
+class JackknifeSampleSet(BootstrapSampleSet):
+    """
+    The central value and jackknife samples of an observable.
+    Arithmetic is as for BootstrapSampleSet, and gives JackknifeSampleSets;
+    only the uncertainty estimates differ,
+    being scaled up to account for the correlation between jackknife samples.
+    Any number of samples is allowed.
+    """
+
+    __slots__ = ()
+    fixed_sample_count = False
+
+    def std(self):
+        return np.sqrt(len(self.samples) - 1) * super().std()
+
+    def covariance(self):
+        num_samples = len(self.samples)
+        return (num_samples - 1) ** 2 / num_samples * super().covariance()
+
+
+class PoissonSampleSet(BootstrapSampleSet):
+    """
+    The central value and Poisson bootstrap replicas of an observable.
+    These are treated as any other bootstrap replicas,
+    but are kept distinct so that they are not combined with
+    replicas drawn by resampling configurations with replacement.
+    """
+
+    __slots__ = ()
+
+
+sample_set_types = {
+    "bootstrap": BootstrapSampleSet,
+    "jackknife": JackknifeSampleSet,
+    "poisson": PoissonSampleSet,
+}
+
+
+def resampling_name(sample_set):
+    """The key of sample_set_types that the type of sample_set corresponds to."""
+    for name, set_type in sample_set_types.items():
+        if type(sample_set) is set_type:
+            return name
+    raise TypeError(f"Unknown sample set type {type(sample_set)}")
+
+
+class BootstrapTable:
+    """
+    Columnar store of observables over a set of ensembles.
+    Each sampled observable is held as a vector of means
+    and one contiguous block of samples with shape (n_ensembles, N_boot);
+    looking it up by name gives a BootstrapSampleSet whose samples
+    are a view of that block, so supports vectorised arithmetic.
+    Other columns, such as metadata, are held as plain arrays.
+    """
+
+    __slots__ = ("ensembles", "means", "samples", "set_types", "columns")
+
+    def __init__(self, ensembles):
+        self.ensembles = list(ensembles)
+        self.means = {}
+        self.samples = {}
+        self.set_types = {}
+        self.columns = {}
+
+    @classmethod
+    def from_records(cls, records, keys, ensembles=None):
+        """
+        Build a table from a list of per-ensemble dicts,
+        taking the columns listed in keys.
+        """
+        table = cls(ensembles if ensembles is not None else range(len(records)))
+        for key in keys:
+            table[key] = [record[key] for record in records]
+        return table
+
+    def __len__(self):
+        return len(self.ensembles)
+
+    def __contains__(self, key):
+        return key in self.means or key in self.columns
+
+    def keys(self):
+        return [*self.means, *self.columns]
+
+    def __getitem__(self, key):
+        if key in self.columns:
+            return self.columns[key]
+        return self.set_types[key](self.means[key], self.samples[key].T)
+
+    def __setitem__(self, key, values):
+        self.means.pop(key, None)
+        self.samples.pop(key, None)
+        self.set_types.pop(key, None)
+        self.columns.pop(key, None)
+
+        if isinstance(values, BootstrapSampleSet):
+            self.means[key] = np.asarray(values.mean)
+            self.samples[key] = np.ascontiguousarray(values.samples.T)
+            self.set_types[key] = type(values)
+        elif len(values) > 0 and all(
+            isinstance(value, BootstrapSampleSet) for value in values
+        ):
+            set_types = {type(value) for value in values}
+            if len(set_types) > 1:
+                raise TypeError(f"Mixed resamplings in column {key}")
+            self.means[key] = np.asarray([value.mean for value in values])
+            self.samples[key] = np.stack([value.samples for value in values])
+            (self.set_types[key],) = set_types
+        else:
+            self.columns[key] = np.asarray(values)
+
+    def ensemble(self, ensemble):
+        """
+        All values for one ensemble, given by name or position,
+        as a dict of plain values and scalar BootstrapSampleSets.
+        """
+        index = (
+            ensemble if isinstance(ensemble, int) else self.ensembles.index(ensemble)
+        )
+        return {
+            **{key: column[index] for key, column in self.columns.items()},
+            **{
+                key: self.set_types[key](
+                    self.means[key][index], self.samples[key][index]
+                )
+                for key in self.means
+            },
+        }
+
+    def select(self, selection):
+        """A new table with only the ensembles picked out by selection."""
+        positions = np.arange(len(self))[selection]
+        table = BootstrapTable([self.ensembles[position] for position in positions])
+        for key in self.means:
+            table.means[key] = self.means[key][positions]
+            table.samples[key] = self.samples[key][positions]
+            table.set_types[key] = self.set_types[key]
+        for key in self.columns:
+            table.columns[key] = self.columns[key][positions]
+        return table
+
+
 def sample_bootstrap_0d(values, *args, **kwargs):
     values_array = np.asarray(values)
     return BootstrapSampleSet(
@@ -127,6 +587,464 @@ def sample_bootstrap_1d(values, *args, **kwargs):
     )
 
 
+def bootstrap_index_dtype(num_configurations):
+    """Smallest integer type able to index num_configurations configurations."""
+    if num_configurations <= np.iinfo(np.uint16).max + 1:
+        return np.uint16
+    return np.int32
+
+
+def bootstrap_index_filename(ensemble, configurations):
+    """
+    File in which to store the bootstrap indices for the given configurations
+    of ensemble; by default in a directory alongside the HDF5 file,
+    or in BOOTSTRAP_INDEX_DIR if that environment variable is set.
+    """
+    directory = os.environ.get(
+        "BOOTSTRAP_INDEX_DIR", f"{ensemble.file.filename}.bootstrap_indices"
+    )
+    key = hashlib.sha256()
+    key.update(ensemble.name.encode("utf8"))
+    key.update(np.asarray(configurations, dtype=np.int64).tobytes())
+    key.update(f"{BOOTSTRAP_SAMPLE_COUNT}/{BOOTSTRAP_CHUNK_SIZE}".encode("utf8"))
+    return os.path.join(directory, f"{key.hexdigest()[:32]}.npy")
+
+
+def generate_bootstrap_indices(name, num_configurations, num_workers=None):
+    dtype = bootstrap_index_dtype(num_configurations)
+    return generate_bootstrap_chunks(
+        name,
+        lambda rng, chunk_size: rng.integers(
+            num_configurations, size=(chunk_size, num_configurations), dtype=dtype
+        ),
+        num_workers=num_workers,
+    )
+
+
+_bootstrap_indices = {}
+
+
+def get_bootstrap_indices(ensemble, selection=None):
+    """
+    Bootstrap resampling indices, with shape (BOOTSTRAP_SAMPLE_COUNT, N_cfg),
+    for the configurations of ensemble picked out by selection
+    (a boolean mask or array of indices into ensemble["configurations"];
+    all configurations if None).
+    The indices are generated once per ensemble and selection,
+    and are stored as a memory-mapped file that is reused by later calls
+    and processes, so that all observables are resampled identically.
+    """
+    configurations = np.arange(len(ensemble["configurations"]))
+    if selection is not None:
+        configurations = configurations[selection]
+
+    filename = bootstrap_index_filename(ensemble, configurations)
+    if filename in _bootstrap_indices:
+        return _bootstrap_indices[filename]
+
+    try:
+        indices = np.load(filename, mmap_mode="r")
+    except (OSError, ValueError):
+        indices = generate_bootstrap_indices(ensemble.name, len(configurations))
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                dir=os.path.dirname(filename), suffix=".tmp", delete=False
+            ) as f:
+                np.save(f, indices)
+            os.replace(f.name, filename)
+            indices = np.load(filename, mmap_mode="r")
+        except OSError:
+            logging.warning(f"Unable to store bootstrap indices in {filename}")
+
+    _bootstrap_indices[filename] = indices
+    return indices
+
+
+def sample_bootstrap_indexed(values, indices):
+    """
+    Resample values, whose first axis runs over configurations,
+    using indices from get_bootstrap_indices.
+    """
+    values_array = np.asarray(values)
+    num_samples, num_configurations = indices.shape
+    if values_array.shape[0] != num_configurations:
+        raise ValueError("Bootstrap indices do not match the number of configurations")
+
+    # Each replica is the mean weighted by how often it draws each configuration,
+    # so the resampled values themselves are never held in memory
+    offsets = np.arange(num_samples)[:, np.newaxis] * num_configurations
+    counts = np.bincount(
+        (indices + offsets).ravel(), minlength=num_samples * num_configurations
+    ).reshape(num_samples, num_configurations)
+    flat_values = values_array.reshape(num_configurations, -1)
+    dtype = np.result_type(flat_values.dtype, np.float32)
+    samples = (counts.astype(dtype) @ flat_values) / num_configurations
+
+    return BootstrapSampleSet(
+        values_array.mean(axis=0),
+        samples.reshape(num_samples, *values_array.shape[1:]),
+    )
+
+
+# Cumulative distribution of Poisson(1), for drawing weights by inversion
+_poisson_cdf = np.cumsum([math.exp(-1) / math.factorial(k) for k in range(20)])
+
+
+def poisson_bootstrap_weights(key, start, stop, sample_count=BOOTSTRAP_SAMPLE_COUNT):
+    """
+    Poisson(1) weights, with shape (stop - start, sample_count),
+    of configurations start to stop in each of sample_count bootstrap replicas.
+    These are drawn from a counter-based Philox stream keyed on key,
+    with a fixed block of counters per configuration,
+    so the weight of a configuration does not depend on
+    which other configurations are drawn with it.
+    """
+    counters_per_configuration = -(-sample_count // 4)
+    bit_generator = np.random.Philox(key=key)
+    bit_generator.advance(int(start) * counters_per_configuration)
+    uniforms = np.random.Generator(bit_generator).random(
+        size=(stop - start, 4 * counters_per_configuration)
+    )
+    return np.searchsorted(_poisson_cdf, uniforms[:, :sample_count]).astype(np.uint8)
+
+
+class PoissonBootstrapAccumulator:
+    """
+    Streaming Poisson bootstrap of an observable.
+    Configurations are added in chunks with update,
+    giving each a Poisson(1) weight in each replica,
+    and only the weighted sums are kept,
+    so memory use is independent of the number of configurations.
+    """
+
+    def __init__(self, name, sample_count=BOOTSTRAP_SAMPLE_COUNT):
+        self.key = name_seed(name)
+        self.sample_count = sample_count
+        self.shape = None
+        self.total = None
+        self.weighted_sums = None
+        self.weight_totals = np.zeros(sample_count)
+        self.count = 0
+
+    def update(self, values, configurations):
+        """
+        Add values (with configurations along the first axis),
+        whose indices in the full set of configurations are configurations.
+        """
+        values_array = np.asarray(values, dtype=float)
+        configurations = np.asarray(configurations)
+        if len(configurations) == 0:
+            return
+        if self.shape is None:
+            self.shape = values_array.shape[1:]
+            self.total = np.zeros(math.prod(self.shape))
+            self.weighted_sums = np.zeros((self.sample_count, math.prod(self.shape)))
+
+        start = configurations.min()
+        weights = poisson_bootstrap_weights(
+            self.key, start, configurations.max() + 1, self.sample_count
+        )[configurations - start]
+
+        flat_values = values_array.reshape(len(values_array), -1)
+        self.total += flat_values.sum(axis=0)
+        self.weighted_sums += weights.T.astype(float) @ flat_values
+        self.weight_totals += weights.sum(axis=0)
+        self.count += len(values_array)
+
+    def result(self):
+        if self.count == 0:
+            raise ValueError("No configurations have been added")
+        return PoissonSampleSet(
+            (self.total / self.count).reshape(self.shape),
+            (self.weighted_sums / self.weight_totals[:, np.newaxis]).reshape(
+                self.sample_count, *self.shape
+            ),
+        )
+
+    def save(self, filename, **metadata):
+        """
+        Store the accumulated sums, and any metadata arrays, in filename,
+        replacing it atomically.
+        """
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(filename), suffix=".tmp", delete=False
+        ) as f:
+            np.savez(
+                f,
+                key=str(self.key),
+                shape=np.asarray(self.shape, dtype=int),
+                total=self.total,
+                weighted_sums=self.weighted_sums,
+                weight_totals=self.weight_totals,
+                count=self.count,
+                **metadata,
+            )
+        os.replace(f.name, filename)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Restore an accumulator stored with save,
+        returning it along with the metadata arrays stored alongside it.
+        """
+        with np.load(filename) as state:
+            accumulator = cls.__new__(cls)
+            accumulator.key = int(state["key"])
+            accumulator.shape = tuple(state["shape"])
+            accumulator.total = state["total"]
+            accumulator.weighted_sums = state["weighted_sums"]
+            accumulator.weight_totals = state["weight_totals"]
+            accumulator.sample_count = len(accumulator.weight_totals)
+            accumulator.count = int(state["count"])
+            metadata = {
+                key: state[key]
+                for key in state.files
+                if key
+                not in ["key", "shape", "total", "weighted_sums"]
+                + ["weight_totals", "count"]
+            }
+        return accumulator, metadata
+
+
+def selection_mask(num_configurations, selection=None):
+    mask = np.zeros(num_configurations, dtype=bool)
+    mask[np.arange(num_configurations) if selection is None else selection] = True
+    return mask
+
+
+def accumulate_streaming(accumulator, dataset, mask, start=0, chunk_size=1024):
+    """
+    Add the configurations of dataset (along its last axis)
+    from start onwards that are picked out by mask to accumulator,
+    reading chunk_size configurations at a time.
+    """
+    num_configurations = dataset.shape[-1]
+    for chunk_start in range(start, num_configurations, chunk_size):
+        chunk_stop = min(chunk_start + chunk_size, num_configurations)
+        chunk_mask = mask[chunk_start:chunk_stop]
+        if not chunk_mask.any():
+            continue
+        chunk = np.moveaxis(np.asarray(dataset[..., chunk_start:chunk_stop]), -1, 0)
+        accumulator.update(chunk[chunk_mask], chunk_start + np.flatnonzero(chunk_mask))
+
+
+def sample_bootstrap_streaming(dataset, name, selection=None, chunk_size=1024):
+    """
+    Poisson-bootstrap dataset (e.g. an HDF5 dataset),
+    which has configurations along its last axis,
+    reading chunk_size configurations at a time.
+    selection is a boolean mask or array of indices picking out configurations,
+    as for get_bootstrap_indices.
+    Replicas are keyed on name and on each configuration's position in dataset,
+    so are reproducible whatever the chunk size.
+    """
+    accumulator = PoissonBootstrapAccumulator(name)
+    accumulate_streaming(
+        accumulator,
+        dataset,
+        selection_mask(dataset.shape[-1], selection),
+        chunk_size=chunk_size,
+    )
+    return accumulator.result()
+
+
+def bootstrap_state_filename(ensemble, *keys):
+    """
+    File in which to store incremental bootstrap state for ensemble,
+    distinguished by keys (e.g. the measurement and configuration filters);
+    by default in a directory alongside the HDF5 file,
+    or in BOOTSTRAP_STATE_DIR if that environment variable is set.
+    """
+    directory = os.environ.get(
+        "BOOTSTRAP_STATE_DIR", f"{ensemble.file.filename}.bootstrap_state"
+    )
+    key = hashlib.sha256()
+    key.update(ensemble.name.encode("utf8"))
+    key.update(repr(keys).encode("utf8"))
+    key.update(str(BOOTSTRAP_SAMPLE_COUNT).encode("utf8"))
+    return os.path.join(directory, f"{key.hexdigest()[:32]}.npz")
+
+
+# Number of configurations spread over the stored part of a dataset
+# whose data are checked before resuming an incremental bootstrap
+DIGEST_SPOT_CHECKS = 8
+
+
+def configurations_digest(dataset, configurations, mask):
+    """
+    Digest identifying the leading len(configurations) configurations
+    of dataset and the selection mask over them.
+    It covers the configuration filenames, the dataset's dtype and
+    the shape of each configuration's data, and, rather than
+    re-reading all the data, that of DIGEST_SPOT_CHECKS configurations
+    spread over them, so that a regenerated file is not mistaken
+    for the one the stored state was built from.
+    """
+    digest = hashlib.sha256()
+    digest.update(b"\0".join(configurations))
+    digest.update(np.packbits(mask).tobytes())
+    digest.update(f"{dataset.dtype.str}{dataset.shape[:-1]}".encode("utf8"))
+    if len(configurations) > 0:
+        spot_checks = np.unique(
+            np.linspace(0, len(configurations) - 1, DIGEST_SPOT_CHECKS).astype(int)
+        )
+        digest.update(np.ascontiguousarray(dataset[..., spot_checks]).tobytes())
+    return digest.hexdigest()
+
+
+def sample_bootstrap_incremental(
+    dataset, name, filename, configurations, selection=None, chunk_size=1024
+):
+    """
+    Poisson-bootstrap dataset as sample_bootstrap_streaming,
+    keeping the accumulated state in filename.
+    configurations holds the configuration filenames along dataset.
+    If the stored state was built from a leading subset of these configurations,
+    with the same selection and matching data (see configurations_digest),
+    only configurations appended since are read;
+    otherwise the state is rebuilt from scratch.
+    The result is identical to that of sample_bootstrap_streaming.
+    """
+    configurations = np.asarray(configurations)
+    mask = selection_mask(len(configurations), selection)
+
+    accumulator, start = PoissonBootstrapAccumulator(name), 0
+    try:
+        stored_accumulator, metadata = PoissonBootstrapAccumulator.load(filename)
+        num_read = int(metadata["num_read"])
+        if num_read <= len(configurations) and str(
+            metadata["digest"]
+        ) == configurations_digest(dataset, configurations[:num_read], mask[:num_read]):
+            accumulator, start = stored_accumulator, num_read
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if start < len(configurations):
+        accumulate_streaming(accumulator, dataset, mask, start, chunk_size)
+        try:
+            accumulator.save(
+                filename,
+                num_read=len(configurations),
+                digest=configurations_digest(dataset, configurations, mask),
+            )
+        except OSError:
+            logging.warning(f"Unable to store bootstrap state in {filename}")
+
+    return accumulator.result()
+
+
+def integrated_autocorrelation_time(values, window_factor=6):
+    """
+    Integrated autocorrelation time, in units of the configuration separation,
+    of each series in values (with configurations along the first axis).
+    The autocorrelation function is computed by FFT, and summed up to
+    the first window W satisfying W >= window_factor * tau_int(W).
+    """
+    values_array = np.asarray(values, dtype=float)
+    num_configurations = len(values_array)
+    series = values_array.reshape(num_configurations, -1)
+
+    fluctuations = series - series.mean(axis=0)
+    spectrum = np.fft.rfft(fluctuations, n=2 * num_configurations, axis=0)
+    autocovariance = np.fft.irfft(np.abs(spectrum) ** 2, axis=0)[:num_configurations]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        autocorrelation = autocovariance / autocovariance[0]
+    autocorrelation[:, autocovariance[0] == 0] = 0
+
+    tau_int = 0.5 + np.cumsum(autocorrelation[1:], axis=0)
+    windows = np.arange(1, num_configurations)[:, np.newaxis]
+    window_reached = windows >= window_factor * tau_int
+    cutoff = np.where(
+        window_reached.any(axis=0), window_reached.argmax(axis=0), len(tau_int) - 1
+    )
+
+    return tau_int[cutoff, np.arange(series.shape[1])].reshape(values_array.shape[1:])
+
+
+def autocorrelation_block_length(values):
+    """
+    Block length for a blocked bootstrap of values: twice the largest
+    integrated autocorrelation time of any of its series, rounded up.
+    """
+    return max(1, int(np.ceil(2 * np.max(integrated_autocorrelation_time(values)))))
+
+
+def sample_bootstrap_blocked(
+    values, name, block_length=None, moving=True, num_workers=None
+):
+    """
+    Bootstrap values (with configurations along the first axis)
+    by resampling blocks of consecutive configurations.
+    With moving set, blocks may start at any configuration;
+    otherwise the configurations are divided into non-overlapping blocks.
+    If block_length is not given, it is set from the integrated
+    autocorrelation time of values; pass it explicitly to resample
+    several observables identically.
+    Blocks are drawn as in generate_bootstrap_chunks, seeded from name.
+    """
+    values_array = np.asarray(values)
+    if block_length is None:
+        block_length = autocorrelation_block_length(values_array)
+    num_blocks = len(values_array) // block_length
+    if num_blocks == 0:
+        raise ValueError(
+            f"Block length {block_length} exceeds {len(values_array)} configurations"
+        )
+
+    if moving:
+        cumulative_sums = np.cumsum(values_array, axis=0)
+        cumulative_sums = np.concatenate(
+            [np.zeros_like(cumulative_sums[:1]), cumulative_sums]
+        )
+        block_means = (
+            cumulative_sums[block_length:] - cumulative_sums[:-block_length]
+        ) / block_length
+    else:
+        block_means = (
+            values_array[: num_blocks * block_length]
+            .reshape(num_blocks, block_length, *values_array.shape[1:])
+            .mean(axis=1)
+        )
+
+    return BootstrapSampleSet(
+        values_array.mean(axis=0),
+        generate_bootstrap_chunks(
+            name,
+            lambda rng, chunk_size: block_means[
+                rng.integers(len(block_means), size=(chunk_size, num_blocks))
+            ].mean(axis=1),
+            num_workers=num_workers,
+        ),
+    )
+
+
+def sample_jackknife(values, block_length=1):
+    """
+    Jackknife values (with configurations along the first axis),
+    leaving out one configuration at a time,
+    or one block of block_length consecutive configurations.
+    Each sample is computed from the total and the omitted block,
+    so the cost is linear in the number of configurations.
+    """
+    values_array = np.asarray(values)
+    num_blocks = len(values_array) // block_length
+    if num_blocks < 2:
+        raise ValueError(
+            f"Need at least two blocks of {block_length} configurations to jackknife"
+        )
+    num_used = num_blocks * block_length
+
+    block_sums = (
+        values_array[:num_used]
+        .reshape(num_blocks, block_length, *values_array.shape[1:])
+        .sum(axis=1)
+    )
+    samples = (block_sums.sum(axis=0) - block_sums) / (num_used - block_length)
+    return JackknifeSampleSet(values_array.mean(axis=0), samples)
+
+
 def bootstrap_finalize(samples):
     if isinstance(samples, BootstrapSampleSet):
         return samples.to_ufloat()
@@ -141,4 +1059,17 @@ __all__ = [
     "bootstrap_finalize",
     "BOOTSTRAP_SAMPLE_COUNT",
     "get_rng",
+    "generate_bootstrap_chunks",
+    "get_bootstrap_indices",
+    "sample_bootstrap_indexed",
+    "sample_bootstrap_blocked",
+    "integrated_autocorrelation_time",
+    "sample_jackknife",
+    "sample_bootstrap_streaming",
+    "sample_bootstrap_incremental",
+    "bootstrap_state_filename",
+    "PoissonBootstrapAccumulator",
+    "JackknifeSampleSet",
+    "PoissonSampleSet",
+    "check_same_resampling",
 ]
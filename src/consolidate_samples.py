@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+from argparse import ArgumentParser
+
+from .dump import SampleStore
+
+
+def get_args():
+    parser = ArgumentParser(
+        description=(
+            "Consolidate intermediary sample and mean files into a single "
+            "indexed sample store"
+        )
+    )
+    parser.add_argument("store_filename", help="The sample store to create or update")
+    parser.add_argument(
+        "data_filenames",
+        nargs="+",
+        help="Sample files (JSON or HDF5) and mean CSV files to add to the store",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    with SampleStore(args.store_filename, "a") as store:
+        for filename in args.data_filenames:
+            store.add_file(filename)
+
+
+if __name__ == "__main__":
+    main()
@@ -43,11 +43,16 @@ def main():
     datum = read_sample_files(args.data_filename)[0]
 
     #  calculation of renormalisation factor based on Eqs. (29) and (30)
-    Z_factor = 1 + 2 * (renormalisation_constant(args.channel)) * (
-        8 / datum["beta"]
-    ) / (16 * np.pi**2 * datum["plaquette_samples"])
+    Z_factor = (
+        2
+        * renormalisation_constant(args.channel)
+        * (8 / datum["beta"])
+        / (16 * np.pi**2)
+        / datum["plaquette_samples"]
+    )
+    Z_factor += 1
 
-    decay_constant = datum[f"{args.channel}_matrix_element_samples"] * Z_factor
+    decay_constant = Z_factor * datum[f"{args.channel}_matrix_element_samples"]
 
     metadata = {
         "ensemble_name": datum["ensemble_name"],
@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 
 from collections import defaultdict
+from functools import lru_cache
+import io
 import json
+import os
 
+import h5py
 import numpy as np
 import pandas as pd
 from uncertainties import ufloat, UFloat
 
-from .bootstrap import BootstrapSampleSet
+from .bootstrap import BootstrapSampleSet, resampling_name, sample_set_types
 
 
 def dump_dict(data, filename):
@@ -28,7 +32,20 @@ def dump_dict(data, filename):
     pd.DataFrame([to_write]).to_csv(filename, index=False)
 
 
+def dump_table(rows, filename):
+    """Write a list of dicts as a CSV table, one row per dict."""
+    split_df_ufloats(pd.DataFrame(rows)).to_csv(filename, index=False)
+
+
+# Sample files with these suffixes are written as HDF5 rather than JSON
+binary_sample_suffixes = (".h5", ".hdf5")
+
+
 def dump_samples(data, fp):
+    if str(getattr(fp, "name", "")).endswith(binary_sample_suffixes):
+        fp.close()
+        return dump_samples_hdf5(data, fp.name)
+
     to_write = {}
     for k, v in data.items():
         if isinstance(v, np.ndarray):
@@ -36,16 +53,55 @@ def dump_samples(data, fp):
         elif isinstance(v, np.int64):
             to_write[k] = int(v)
         elif isinstance(v, BootstrapSampleSet):
-            if isinstance(v.mean, np.ndarray):
-                to_write[f"{k}_value"] = list(v.mean)
-            else:
-                to_write[f"{k}_value"] = v.mean
+            to_write[f"{k}_value"] = np.asarray(v.mean).tolist()
             to_write[f"{k}_samples"] = v.samples.tolist()
+            if (resampling := resampling_name(v)) != "bootstrap":
+                to_write[f"{k}_resampling"] = resampling
         else:
             to_write[k] = v
     return json.dump(to_write, fp)
 
 
+def json_metadatum(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    return value
+
+
+def write_samples_group(group, data):
+    """
+    Write data, as passed to dump_samples, into the HDF5 group group.
+    Central values and samples are stored as contiguous float64 datasets,
+    so that they can be memory-mapped when read back;
+    other arrays are stored as datasets,
+    and everything else as a JSON-encoded "metadata" attribute.
+    """
+    metadata = {}
+    for k, v in data.items():
+        if isinstance(v, BootstrapSampleSet):
+            group.create_dataset(
+                f"{k}_value", data=np.asarray(v.mean, dtype=np.float64)
+            )
+            group.create_dataset(
+                f"{k}_samples", data=np.asarray(v.samples, dtype=np.float64)
+            )
+            if (resampling := resampling_name(v)) != "bootstrap":
+                metadata[f"{k}_resampling"] = resampling
+        elif isinstance(v, np.ndarray):
+            group.create_dataset(k, data=v)
+        else:
+            metadata[k] = json_metadatum(v)
+    group.attrs["metadata"] = json.dumps(metadata)
+
+
+def dump_samples_hdf5(data, filename):
+    """Write data as dump_samples does, but to an HDF5 file."""
+    with h5py.File(filename, "w", libver="latest") as h5file:
+        write_samples_group(h5file, data)
+
+
 def combine_df_ufloats(df):
     result = pd.DataFrame()
     for column_name in df.columns:
@@ -171,10 +227,24 @@ key_observables = {
 }
 
 
-def read_files(filenames, index_name="ensemble_name"):
-    data = defaultdict(list)
+def iter_mean_files(filenames, observables=None):
+    """
+    Read each of filenames as a CSV file, yielding the filename and the data.
+    A sample store yields each of its mean tables in turn,
+    restricted to observables if given.
+    """
     for filename in filenames:
-        file_data = pd.read_csv(filename)
+        if is_sample_store(filename):
+            with SampleStore(filename) as store:
+                for file_data in store.read_means(observables):
+                    yield filename, file_data
+        else:
+            yield filename, pd.read_csv(filename)
+
+
+def read_files(filenames, index_name="ensemble_name", observables=None):
+    data = defaultdict(list)
+    for filename, file_data in iter_mean_files(filenames, observables):
         if index_name is None:
             data[None].append(file_data)
         else:
@@ -195,27 +265,246 @@ def read_files(filenames, index_name="ensemble_name"):
     return combine_df_ufloats(result)
 
 
-def read_sample_file(filename):
-    with open(filename, "r") as f:
-        raw_data = json.load(f)
-
+def sample_sets_from_raw(raw_data):
+    """
+    Combine the _value and _samples fields of raw_data,
+    as read from a sample file, into sample sets.
+    """
     data = {}
     samples_fields = [key for key in raw_data if key.endswith("_samples")]
     for samples_field in samples_fields:
         value_field = samples_field.replace("_samples", "_value")
         if value_field not in raw_data:
             raise ValueError("Bootstrap samples with no central value")
-        data[samples_field] = BootstrapSampleSet(
+        set_type = sample_set_types[
+            raw_data.pop(samples_field.replace("_samples", "_resampling"), "bootstrap")
+        ]
+        data[samples_field] = set_type(
             raw_data.pop(value_field), raw_data.pop(samples_field)
         )
 
     return {**data, **raw_data}
 
 
-def read_sample_files(filenames, group_key="ensemble_name"):
-    results = {}
+def read_sample_file(filename):
+    if h5py.is_hdf5(filename):
+        return read_sample_file_hdf5(filename)
+
+    with open(filename, "r") as f:
+        raw_data = json.load(f)
+
+    return sample_sets_from_raw(raw_data)
+
+
+# Datasets smaller than this are read into memory rather than mapped
+MIN_MAPPED_BYTES = 64 * 1024
+
+
+@lru_cache(maxsize=64)
+def map_file(filename, mtime_ns, size):
+    """
+    Read-only memory map of the whole of filename,
+    shared by all datasets read from it.
+    The modification time and size are part of the cache key,
+    so that a rewritten file is mapped afresh.
+    """
+    return np.memmap(filename, mode="r", dtype=np.uint8)
+
+
+def read_dataset(dataset):
+    """
+    Read dataset from an HDF5 file,
+    as a read-only view of a memory map of the file where its layout allows it,
+    so that large sample arrays are not read until they are used.
+    Small datasets are read into memory.
+    """
+    offset = dataset.id.get_offset()
+    if (
+        offset is None
+        or dataset.chunks is not None
+        or dataset.shape == ()
+        or dataset.nbytes < MIN_MAPPED_BYTES
+    ):
+        return dataset[()]
+
+    stat = os.stat(dataset.file.filename)
+    file_map = map_file(dataset.file.filename, stat.st_mtime_ns, stat.st_size)
+    return (
+        file_map[offset : offset + dataset.nbytes]
+        .view(dataset.dtype)
+        .reshape(dataset.shape)
+    )
+
+
+def read_samples_group(group):
+    """
+    Read data written by write_samples_group.
+    Large sample arrays are memory-mapped rather than read into memory;
+    other arrays are returned as lists, as from a JSON file.
+    """
+    raw_data = json.loads(group.attrs["metadata"])
+    for key, dataset in group.items():
+        if key.endswith(("_samples", "_value")):
+            raw_data[key] = read_dataset(dataset)
+        else:
+            raw_data[key] = dataset[()].tolist()
+
+    return sample_sets_from_raw(raw_data)
+
+
+def read_sample_file_hdf5(filename):
+    """Read a sample file written by dump_samples_hdf5."""
+    with h5py.File(filename, "r") as h5file:
+        return read_samples_group(h5file)
+
+
+def store_key(filename):
+    """
+    The (directory, observable) key under which the intermediary file filename
+    is held in a SampleStore, e.g. ("<ensemble>", "meson_ps")
+    for intermediary_data/<ensemble>/meson_ps_samples.h5.
+    """
+    directory = os.path.basename(os.path.dirname(os.path.abspath(filename)))
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return directory, stem.removesuffix("_samples").removesuffix("_mean")
+
+
+class SampleStore:
+    """
+    A single HDF5 file consolidating many intermediary sample and mean files.
+    Sample data are held under samples/<directory>/<observable>,
+    in the layout of dump_samples_hdf5,
+    and the contents of mean CSV files under means/<directory>/<observable>.
+    The index of entries is kept as an attribute of the file,
+    and read once on opening,
+    so that entries are looked up directly rather than searched for,
+    and consumers can load only the observables they need.
+    """
+
+    kinds = ("samples", "means")
+
+    def __init__(self, filename, mode="r"):
+        self.h5file = h5py.File(filename, mode, libver="latest")
+        self.writable = mode != "r"
+        if "index" in self.h5file.attrs:
+            self.index = {
+                (kind, directory, observable)
+                for kind, directory, observable in json.loads(
+                    self.h5file.attrs["index"]
+                )
+            }
+        elif self.writable:
+            self.h5file.attrs["sample_store"] = True
+            self.index = set()
+        else:
+            raise ValueError(f"{filename} is not a sample store")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.writable:
+            self.h5file.attrs["index"] = json.dumps(sorted(self.index))
+        self.h5file.close()
+
+    def new_entry(self, kind, directory, observable):
+        path = f"{kind}/{directory}/{observable}"
+        if path in self.h5file:
+            del self.h5file[path]
+        self.index.add((kind, directory, observable))
+        return path
+
+    def add_samples(self, directory, observable, data):
+        """Store data, as passed to dump_samples."""
+        group = self.h5file.create_group(
+            self.new_entry("samples", directory, observable)
+        )
+        write_samples_group(group, data)
+
+    def add_mean(self, directory, observable, csv_text):
+        """Store the contents of a mean CSV file, as written by dump_dict."""
+        self.h5file.create_dataset(
+            self.new_entry("means", directory, observable),
+            data=csv_text,
+            dtype=h5py.string_dtype(),
+        )
+
+    def add_file(self, filename):
+        """Add an intermediary sample or mean file, replacing any earlier copy."""
+        directory, observable = store_key(filename)
+        if filename.endswith(".csv"):
+            with open(filename, "r") as f:
+                self.add_mean(directory, observable, f.read())
+        else:
+            data = {
+                (
+                    key.removesuffix("_samples")
+                    if isinstance(value, BootstrapSampleSet)
+                    else key
+                ): value
+                for key, value in read_sample_file(filename).items()
+            }
+            self.add_samples(directory, observable, data)
+
+    def entries(self, kind, observables=None, directories=None):
+        return [
+            (directory, observable)
+            for entry_kind, directory, observable in sorted(self.index)
+            if entry_kind == kind
+            and (observables is None or observable in observables)
+            and (directories is None or directory in directories)
+        ]
+
+    def read_samples(self, observables=None, directories=None):
+        """
+        Read the sample data of the selected entries,
+        as read_sample_file would from the original files.
+        """
+        return [
+            read_samples_group(self.h5file[f"samples/{directory}/{observable}"])
+            for directory, observable in self.entries(
+                "samples", observables, directories
+            )
+        ]
+
+    def read_means(self, observables=None, directories=None):
+        """Read the selected mean tables, as DataFrames."""
+        return [
+            pd.read_csv(
+                io.StringIO(self.h5file[f"means/{directory}/{observable}"][()].decode())
+            )
+            for directory, observable in self.entries("means", observables, directories)
+        ]
+
+
+def is_sample_store(filename):
+    if not h5py.is_hdf5(filename):
+        return False
+    with h5py.File(filename, "r") as h5file:
+        return "sample_store" in h5file.attrs
+
+
+def iter_sample_files(filenames, observables=None):
+    """
+    Read each of filenames, yielding the filename and the data read.
+    A sample store yields the data of each of its entries in turn,
+    restricted to observables if given.
+    """
     for filename in filenames:
-        file_data = read_sample_file(filename)
+        if is_sample_store(filename):
+            with SampleStore(filename) as store:
+                for file_data in store.read_samples(observables):
+                    yield filename, file_data
+        else:
+            yield filename, read_sample_file(filename)
+
+
+def read_sample_files(filenames, group_key="ensemble_name", observables=None):
+    results = {}
+    for filename, file_data in iter_sample_files(filenames, observables):
         if file_data.get(group_key) not in results:
             results[file_data.get(group_key)] = file_data
         else:
@@ -1,59 +1,280 @@
-from . import fitting
+from . import fitting, fitting_batched
+import itertools
+import logging
 import numpy as np
-from scipy import linalg
+from scipy.optimize import linear_sum_assignment
 from .bootstrap import BootstrapSampleSet
 
 
-def extract_meson_mass(C_tmp, plateau_start, plateau_end):
-    E_fit, A_fit, chisquare = fitting.fit_cosh_bootstrap(
-        C_tmp, plateau_start, plateau_end
+fit_backends = {"corrfitter": fitting, "batched": fitting_batched}
+
+
+def fit_options(fit_backend, num_workers, svdcut):
+    # The batched backend is vectorised over samples, so needs no process pool
+    if fit_backend == "corrfitter":
+        return {"num_workers": num_workers, "svdcut": svdcut}
+    return {"svdcut": svdcut}
+
+
+def extract_meson_mass(
+    C_tmp,
+    plateau_start,
+    plateau_end,
+    fit_backend="corrfitter",
+    num_workers=None,
+    svdcut=1e-12,
+):
+    E_fit, A_fit, chisquare = fit_backends[fit_backend].fit_cosh_bootstrap(
+        C_tmp,
+        plateau_start,
+        plateau_end,
+        **fit_options(fit_backend, num_workers, svdcut),
     )
 
     return E_fit, A_fit, round(chisquare, 2)
 
 
-def meson_decay_constant(Css, Csp, plateau_start, plateau_end):
+def meson_decay_constant(
+    Css,
+    Csp,
+    plateau_start,
+    plateau_end,
+    fit_backend="corrfitter",
+    num_workers=None,
+    svdcut=1e-12,
+):
     # load the ensamble info
     lattice_t = np.shape(Css.mean)[1]
 
-    E_fit, A_fit, chisquare = fitting.fit_coshsinh_simultaneous(
-        Css, Csp, plateau_start, plateau_end, lattice_t
+    E_fit, A_fit, chisquare = fit_backends[fit_backend].fit_coshsinh_simultaneous(
+        Css,
+        Csp,
+        plateau_start,
+        plateau_end,
+        lattice_t,
+        **fit_options(fit_backend, num_workers, svdcut),
     )
 
     return E_fit, A_fit, round(chisquare, 2)
 
 
-def GEVP_fixT(Cmat_mean, Cmat, t0, ti, tf):
-    Mshape = Cmat.shape
+def scan_meson_mass(C_tmp, min_window_length=3, svdcut=1e-12):
+    E_fit, A_fit, chisquare, window_results = fitting_batched.scan_cosh_bootstrap(
+        C_tmp, min_window_length, svdcut=svdcut
+    )
+
+    return E_fit, A_fit, round(chisquare, 2), window_results
+
+
+def scan_decay_constant(Css, Csp, min_window_length=3, svdcut=1e-12):
+    lattice_t = np.shape(Css.mean)[1]
+
+    E_fit, A_fit, chisquare, window_results = (
+        fitting_batched.scan_coshsinh_simultaneous(
+            Css, Csp, lattice_t, min_window_length, svdcut=svdcut
+        )
+    )
+
+    return E_fit, A_fit, round(chisquare, 2), window_results
+
+
+def solve_gevp_cholesky(Cmat, t0, time_slices):
+    """
+    Solve the GEVP for a stack of symmetric correlator matrices
+    whose C(t0) are all positive definite, as described in solve_gevp.
+    """
+    L_inverse = np.linalg.inv(np.linalg.cholesky(Cmat[:, t0]))[:, np.newaxis]
+    L_inverse_T = np.swapaxes(L_inverse, -1, -2)
+
+    values, reduced_vectors = np.linalg.eigh(
+        L_inverse @ Cmat[:, time_slices] @ L_inverse_T
+    )
+    vectors = L_inverse_T @ reduced_vectors
+
+    return values[..., ::-1], vectors[..., ::-1]
+
+
+def is_positive_definite(matrix):
+    try:
+        np.linalg.cholesky(matrix)
+    except np.linalg.LinAlgError:
+        return False
+    return True
+
+
+def solve_gevp_general(Cmat, t0, time_slices):
+    """
+    Solve the GEVP for a single correlator matrix whose C(t0)
+    is not positive definite, as a general eigenproblem
+    for C(t0)^-1 C(t), keeping the real parts of the solutions.
+    Eigenvectors are normalised such that |v^T C(t0) v| = 1.
+    If C(t0) is singular, all results are NaN.
+    """
+    num_states = Cmat.shape[-1]
+    try:
+        values, vectors = np.linalg.eig(np.linalg.solve(Cmat[t0], Cmat[time_slices]))
+    except np.linalg.LinAlgError:
+        nan = np.full((len(time_slices), num_states, num_states), np.nan)
+        return nan[..., 0], nan
 
-    Lambda_n_sample = np.zeros(shape=(Mshape[0], Mshape[1], Mshape[2]))
-    Lambda_n_mean = np.zeros(shape=(1, Mshape[1], Mshape[2]))
+    ordering = np.argsort(-values.real, axis=-1)
+    values = np.take_along_axis(values.real, ordering, axis=-1)
+    vectors = np.take_along_axis(vectors.real, ordering[:, np.newaxis, :], axis=-1)
+    norms = np.einsum("tam,ab,tbm->tm", vectors, Cmat[t0], vectors)
+    return values, vectors / np.sqrt(np.abs(norms))[:, np.newaxis, :]
 
-    T_dot = np.arange(ti, tf, 1, dtype=int)
-    for t in T_dot:
-        for N in range(Mshape[0]):
-            value, vector = linalg.eig(
-                Cmat[N, t], Cmat[N, t0], overwrite_a=True, overwrite_b=True
-            )
 
-            for n in range(Mshape[2]):
-                Lambda_n_sample[N, t, n] = np.real(value[n])
+def solve_gevp(Cmat, t0, time_slices):
+    """
+    Solve the generalised eigenvalue problem C(t) v = lambda C(t0) v
+    for a stack of correlator matrices Cmat with shape (N, Nt, n, n),
+    at all time slices and for all N matrices at once.
+    C(t0) is Cholesky-reduced once per matrix,
+    and the resulting symmetric eigenproblems solved in one stacked call.
+    Returns eigenvalues with shape (N, len(time_slices), n) in descending order,
+    and the corresponding eigenvectors as the columns of an array with shape
+    (N, len(time_slices), n, n), normalised such that v^T C(t0) v = 1.
+    Matrices (such as single bootstrap samples) for which C(t0)
+    is not positive definite are instead solved one by one
+    with solve_gevp_general, so that they do not abort the whole solution.
+    """
+    # Each correlator matrix is symmetrised, so that the eigenproblem is real
+    Cmat = (Cmat + np.swapaxes(Cmat, -1, -2)) / 2
 
-        #### mean set ####
-        value_m, vector_m = linalg.eig(
-            Cmat_mean[0, t], Cmat_mean[0, t0], overwrite_a=True, overwrite_b=True
+    try:
+        return solve_gevp_cholesky(Cmat, t0, time_slices)
+    except np.linalg.LinAlgError:
+        pass
+
+    positive_definite = np.array(
+        [is_positive_definite(matrix) for matrix in Cmat[:, t0]]
+    )
+    logging.warning(
+        f"C(t0) is not positive definite for {(~positive_definite).sum()} "
+        f"of {len(Cmat)} matrices; solving these as general eigenproblems"
+    )
+
+    num_states = Cmat.shape[-1]
+    values = np.empty((len(Cmat), len(time_slices), num_states))
+    vectors = np.empty((len(Cmat), len(time_slices), num_states, num_states))
+    if positive_definite.any():
+        values[positive_definite], vectors[positive_definite] = solve_gevp_cholesky(
+            Cmat[positive_definite], t0, time_slices
+        )
+    for index in np.flatnonzero(~positive_definite):
+        values[index], vectors[index] = solve_gevp_general(Cmat[index], t0, time_slices)
+    return values, vectors
+
+
+# Largest number of states for which all permutations are scored at once;
+# beyond this, assignments are found one sample and time slice at a time
+MAX_PERMUTED_STATES = 4
+
+
+def best_assignments(overlaps):
+    """
+    The permutation of the columns of each matrix in overlaps
+    (with shape (..., n, n)) maximising the sum of its diagonal.
+    For up to MAX_PERMUTED_STATES states every permutation is scored
+    in one vectorised pass; otherwise a linear sum assignment is solved
+    for each matrix.
+    Matrices with non-finite elements are left in order.
+    """
+    num_states = overlaps.shape[-1]
+    finite = np.isfinite(overlaps).all(axis=(-1, -2))
+    ordering = np.broadcast_to(np.arange(num_states), overlaps.shape[:-1]).copy()
+
+    if num_states <= MAX_PERMUTED_STATES:
+        permutations = np.array(list(itertools.permutations(range(num_states))))
+        scores = np.zeros((*overlaps.shape[:-2], len(permutations)))
+        for state in range(num_states):
+            scores += overlaps[..., state, permutations[:, state]]
+        ordering[finite] = permutations[scores[finite].argmax(axis=-1)]
+    else:
+        for index in zip(*np.nonzero(finite)):
+            _, ordering[index] = linear_sum_assignment(overlaps[index], maximize=True)
+
+    return ordering
+
+
+def track_states(Cmat_t0, values, vectors, reference_vectors):
+    """
+    Reorder the states returned by solve_gevp so that, for every sample
+    and time slice, state n is the one whose eigenvector overlaps most
+    with column n of reference_vectors,
+    rather than the one with the n-th largest eigenvalue.
+    The same references are used for all samples,
+    so that states are labelled consistently across them.
+    Overlaps are taken in the metric C(t0) of each sample, and the assignment
+    chosen to maximise the total overlap (see best_assignments).
+    """
+    overlaps = np.abs(
+        np.einsum(
+            "ai,sab,stbj->stij", reference_vectors, Cmat_t0, vectors, optimize=True
         )
+    )
+
+    # Samples without a solution (see solve_gevp_general) are left in order
+    ordering = best_assignments(overlaps)
+
+    return (
+        np.take_along_axis(values, ordering, axis=-1),
+        np.take_along_axis(vectors, ordering[..., np.newaxis, :], axis=-1),
+    )
 
-        for n in range(Mshape[2]):
-            Lambda_n_mean[0, t, n] = np.real(value_m[n])
 
-    Lambda_n_sample.sort(axis=2)
-    Lambda_n_mean.sort(axis=2)
+def GEVP_fixT(
+    Cmat_mean,
+    Cmat,
+    t0,
+    ti,
+    tf,
+    return_eigenvectors=False,
+    reference_t=None,
+    set_type=BootstrapSampleSet,
+):
+    """
+    Solve the GEVP with fixed t0 for time slices ti <= t < tf,
+    returning the eigenvalues of each state as a list of sample sets
+    over all Nt time slices.
+    By default states are ordered by descending eigenvalue at each time slice.
+    If reference_t is given, states are instead tracked by eigenvector overlap
+    across time slices and samples, taking as references the eigenvectors
+    of the mean correlator matrix at t = reference_t, in descending order.
+    If return_eigenvectors is set, the eigenvectors of each state
+    are returned as a second list in the same layout,
+    with a trailing axis over the components of the vector.
+    Results are wrapped in set_type,
+    which should match the resampling scheme used to produce Cmat.
+    """
+    num_samples, lattice_t, num_states, _ = Cmat.shape
+    time_slices = np.arange(ti, tf, 1, dtype=int)
+
+    Lambda_n = np.zeros(shape=(1 + num_samples, lattice_t, num_states))
+    V_n = np.zeros(shape=(1 + num_samples, lattice_t, num_states, num_states))
+
+    # The mean is solved as an extra sample alongside the bootstrap samples
+    Cmat_all = np.concatenate([Cmat_mean, Cmat])
+    values, vectors = solve_gevp(Cmat_all, t0, time_slices)
+
+    if reference_t is not None:
+        if not ti <= reference_t < tf:
+            raise ValueError(f"reference_t={reference_t} outside [{ti}, {tf})")
+        Cmat_t0 = (Cmat_all[:, t0] + np.swapaxes(Cmat_all[:, t0], -1, -2)) / 2
+        # References come from the mean, solved as the first sample
+        values, vectors = track_states(
+            Cmat_t0, values, vectors, vectors[0, reference_t - ti]
+        )
+
+    Lambda_n[:, time_slices], V_n[:, time_slices] = values, vectors
 
-    samples = Lambda_n_sample[:, :, ::-1]
-    mean = Lambda_n_mean[:, :, ::-1]
-    eigenvalues = []
-    for n in range(Mshape[2]):
-        eigenvalues.append(BootstrapSampleSet(mean[:, :, n], samples[:, :, n]))
+    eigenvalues = [
+        set_type(Lambda_n[:1, :, n], Lambda_n[1:, :, n]) for n in range(num_states)
+    ]
+    if not return_eigenvectors:
+        return eigenvalues
 
-    return eigenvalues
+    eigenvectors = [
+        set_type(V_n[:1, :, :, n], V_n[1:, :, :, n]) for n in range(num_states)
+    ]
+    return eigenvalues, eigenvectors
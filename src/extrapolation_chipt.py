@@ -10,12 +10,14 @@ def main():
         args.data_filenames,
         ["ps_mass", "ps_decay_constant", "mAS"],
         beta=args.beta,
+        store_observables=args.store_observables,
     )
 
     fit_result = global_meson_fit(
         linear_fit_form,
         data["ps_mass_squared"],
         data["ps_decay_constant_squared"],
+        num_workers=args.num_workers,
     )
 
     dump_fit_result(
@@ -4,6 +4,7 @@ from argparse import ArgumentParser, FileType
 
 import numpy as np
 
+from .bootstrap import BootstrapSampleSet, BootstrapTable, check_same_resampling
 from .dump import dump_dict, dump_samples, read_sample_files
 
 
@@ -31,6 +32,16 @@ def get_args(channels=None, beta=False):
             help="Measuring channel",
         )
 
+    parser.add_argument(
+        "--store_observables",
+        nargs="+",
+        default=None,
+        help=(
+            "Observables (intermediary file names, such as meson_ps) "
+            "to load from any sample store among the sample files"
+        ),
+    )
+
     parser.add_argument("--output_file_mean", type=FileType("w"), default="-")
 
     parser.add_argument(
@@ -39,15 +50,28 @@ def get_args(channels=None, beta=False):
         default=None,
         help="Where to output the bootstrap samples for fitting results",
     )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=None,
+        help=(
+            "Number of processes over which to spread bootstrap sample fits. "
+            "(Defaults to the FIT_NUM_WORKERS environment variable, or 1.)"
+        ),
+    )
 
     return parser.parse_args()
 
 
 def compute_derived_spectrum(source, target, observable):
-    obs_value = target[observable]
-
-    target[f"{observable}_squared"] = obs_value**2
-    target[f"log_{observable}_squared"] = np.log(obs_value**2)
+    # Derived quantities are evaluated lazily, each in a single pass.
+    # The square is shared by several of them, so is evaluated once up front,
+    # rather than separately within each.
+    obs_value = target[observable].lazy()
+    obs_squared = (obs_value**2).evaluate()
+
+    target[f"{observable}_squared"] = obs_squared
+    target[f"log_{observable}_squared"] = np.log(obs_squared)
     created_keys = [f"{observable}_squared", f"log_{observable}_squared"]
 
     if "w0_samples" in source:
@@ -60,22 +84,28 @@ def compute_derived_spectrum(source, target, observable):
         created_keys.append(f"{observable}_over_ps_decay_constant")
     if "mPCAC_samples" in source:
         target[f"log_{observable}_squared_over_mPCAC"] = np.log(
-            obs_value**2 / source["mPCAC_samples"]
+            obs_squared / source["mPCAC_samples"]
         )
         created_keys.append(f"log_{observable}_squared_over_mPCAC")
 
     return created_keys
 
 
-def get_data(filenames, observables, beta=None):
-    data = read_sample_files(filenames)
+def get_data(filenames, observables, beta=None, store_observables=None):
+    data = read_sample_files(filenames, observables=store_observables)
     results = []
+    ensembles = []
     extra_observables = set()
     for datum in data:
         datum_result = {}
         if beta is not None and (datum.get("beta") != beta):
             continue
 
+        # Samples can only be combined if all come from the same resampling
+        check_same_resampling(
+            [value for value in datum.values() if isinstance(value, BootstrapSampleSet)]
+        )
+
         for observable in observables:
             if observable in datum:
                 # This is not a sample set, so just copy across as-is
@@ -102,11 +132,13 @@ def get_data(filenames, observables, beta=None):
         else:
             # Only append if all required observables were found
             results.append(datum_result)
+            ensembles.append(datum.get("ensemble_name", len(ensembles)))
 
-    return {
-        observable: np.asarray([datum[observable] for datum in results])
-        for observable in (observables + list(extra_observables))
-    }
+    return BootstrapTable.from_records(
+        results,
+        observables + list(extra_observables),
+        ensembles=ensembles,
+    )
 
 
 def check_name_value_lengths(names, values):
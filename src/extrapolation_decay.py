@@ -9,13 +9,18 @@ from .extrapolation_common import get_args, get_data, dump_fit_result
 def main():
     args = get_args(channels=["ps", "v", "av"])
     channel_obs_key = f"{args.channel}_decay_constant"
-    data = get_data(args.data_filenames, ["w0", "ps_mass", channel_obs_key])
+    data = get_data(
+        args.data_filenames,
+        ["w0", "ps_mass", channel_obs_key],
+        store_observables=args.store_observables,
+    )
 
     lat_a_means, _ = split_means_samples(data["lat_a"])
     fit_result = global_meson_fit(
         partial(mass_square_fit_form, lat_a=lat_a_means),
         data["ps_mass_hat_squared"],
         data[f"{channel_obs_key}_hat_squared"],
+        num_workers=args.num_workers,
     )
 
     dump_fit_result(args, "continuum_decay_constant", fit_result, ["F", "L", "W"])
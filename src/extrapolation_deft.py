@@ -11,12 +11,14 @@ def main():
         args.data_filenames,
         ["ps_mass", "ps_decay_constant", "mPCAC", "mAS"],
         beta=args.beta,
+        store_observables=args.store_observables,
     )
 
     fit_result = global_meson_fit(
         linear_fit_form,
         data["log_ps_decay_constant_squared"],
         data["log_ps_mass_squared_over_mPCAC"],
+        num_workers=args.num_workers,
     )
 
     dump_fit_result(
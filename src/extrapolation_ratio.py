@@ -10,7 +10,9 @@ def main():
     args = get_args(channels=["ps", "v", "av"])
     channel_obs_key = f"{args.channel}_mass"
     data = get_data(
-        args.data_filenames, ["w0", "ps_mass", "ps_decay_constant", channel_obs_key]
+        args.data_filenames,
+        ["w0", "ps_mass", "ps_decay_constant", channel_obs_key],
+        store_observables=args.store_observables,
     )
 
     lat_a_means, _ = split_means_samples(data["lat_a"])
@@ -18,6 +20,7 @@ def main():
         partial(mass_square_fit_form, lat_a=lat_a_means),
         data["ps_mass_hat_squared"],
         data[f"{channel_obs_key}_over_ps_decay_constant"],
+        num_workers=args.num_workers,
     )
 
     dump_fit_result(
@@ -1,17 +1,410 @@
-from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial, wraps
+import hashlib
+import inspect
+import sys
+import tempfile
 
 import corrfitter as cf
 import gvar as gv
 import logging
+import lsqfit
 import numpy as np
+import os
 from scipy.optimize import curve_fit, minimize
 import warnings
 
-from .bootstrap import BootstrapSampleSet
+from .bootstrap import BootstrapSampleSet, resampling_name, sample_set_types
 
 warnings.filterwarnings("ignore")
 
 
+def get_num_workers(num_workers=None):
+    """
+    Number of processes to use for per-sample fits.
+    Taken from the FIT_NUM_WORKERS environment variable if not given.
+    """
+    if num_workers is None:
+        num_workers = int(os.environ.get("FIT_NUM_WORKERS", 1))
+    return max(num_workers, 1)
+
+
+def map_samples(function, *sample_iterables, num_workers=None):
+    """
+    Apply function to each bootstrap sample in turn,
+    spreading the work over a process pool if more than one worker is requested.
+    Results are returned in sample order,
+    and are identical to those of the serial path.
+    """
+    num_workers = get_num_workers(num_workers)
+    sample_lists = [list(samples) for samples in sample_iterables]
+    if num_workers == 1:
+        return list(map(function, *sample_lists))
+
+    chunksize = -(-len(sample_lists[0]) // num_workers)
+    with ProcessPoolExecutor(num_workers) as executor:
+        return list(executor.map(function, *sample_lists, chunksize=chunksize))
+
+
+class FitCache:
+    """
+    On-disk cache of fit results, keyed by a hash of the fit inputs
+    and of the code performing the fit.
+    Once the cache exceeds max_bytes,
+    the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory, max_bytes=2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def filename(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def load(self, key):
+        filename = self.filename(key)
+        try:
+            with np.load(filename) as cached:
+                result = decode_fit_result(cached)
+        except (OSError, ValueError, KeyError):
+            self.record("miss")
+            return None
+
+        # Mark as recently used
+        os.utime(filename)
+        self.record("hit")
+        return result
+
+    def store(self, key, result):
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory, suffix=".tmp", delete=False
+        ) as f:
+            np.savez(f, **encode_fit_result(result))
+        os.replace(f.name, self.filename(key))
+        self.evict()
+
+    def entries(self):
+        with os.scandir(self.directory) as directory_entries:
+            return [
+                entry
+                for entry in directory_entries
+                if entry.is_file() and entry.name.endswith(".npz")
+            ]
+
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda entry: entry.stat().st_mtime)
+        total_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            total_bytes -= entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self.record("eviction")
+
+    def record(self, event):
+        if event == "hit":
+            self.hits += 1
+        elif event == "miss":
+            self.misses += 1
+        else:
+            self.evictions += 1
+
+        # Appends this short are atomic, so concurrent processes may share the log
+        with open(os.path.join(self.directory, "events.log"), "a") as f:
+            print(event, file=f)
+
+    def statistics(self):
+        """Hit, miss, and eviction counts for this process and all time."""
+        cumulative = {"hit": 0, "miss": 0, "eviction": 0}
+        try:
+            with open(os.path.join(self.directory, "events.log")) as f:
+                for line in f:
+                    if line.strip() in cumulative:
+                        cumulative[line.strip()] += 1
+        except FileNotFoundError:
+            pass
+
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "cumulative_hits": cumulative["hit"],
+            "cumulative_misses": cumulative["miss"],
+            "cumulative_evictions": cumulative["eviction"],
+            "entries": len(entries),
+            "bytes": sum(entry.stat().st_size for entry in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+_fit_cache = None
+
+
+def get_fit_cache():
+    """
+    The fit cache configured by the FIT_CACHE_DIR
+    and FIT_CACHE_MAX_BYTES environment variables,
+    or None if caching is disabled.
+    """
+    global _fit_cache
+    directory = os.environ.get("FIT_CACHE_DIR")
+    if not directory:
+        return None
+    if _fit_cache is None or _fit_cache.directory != directory:
+        _fit_cache = FitCache(
+            directory, int(os.environ.get("FIT_CACHE_MAX_BYTES", 2**30))
+        )
+    return _fit_cache
+
+
+def encode_fit_result(result):
+    encoded = {}
+    for index, value in enumerate(result):
+        if isinstance(value, BootstrapSampleSet):
+            encoded[f"{index}_mean"] = value.mean
+            encoded[f"{index}_samples"] = value.samples
+            encoded[f"{index}_resampling"] = resampling_name(value)
+        else:
+            encoded[f"{index}_value"] = value
+    return encoded
+
+
+def decode_fit_result(cached):
+    result = []
+    for index in range(len(cached.files)):
+        if f"{index}_value" in cached.files:
+            result.append(cached[f"{index}_value"][()])
+        elif f"{index}_mean" in cached.files:
+            mean = cached[f"{index}_mean"]
+            set_type = sample_set_types[str(cached[f"{index}_resampling"])]
+            result.append(
+                set_type(mean if mean.ndim else mean[()], cached[f"{index}_samples"])
+            )
+        else:
+            break
+    return tuple(result)
+
+
+def hash_fit_input(hasher, value):
+    """
+    Feed value to hasher in an unambiguous encoding:
+    every item is tagged with its type and prefixed with its length,
+    and containers with their number of items,
+    so that distinct inputs cannot run together into the same bytes.
+    """
+
+    def update(tag, payload=b""):
+        hasher.update(f"{tag}:{len(payload)}:".encode())
+        hasher.update(payload)
+
+    if isinstance(value, np.generic):
+        value = value.item()
+
+    if isinstance(value, BootstrapSampleSet):
+        update("sample set", resampling_name(value).encode())
+        hash_fit_input(hasher, value.mean)
+        hash_fit_input(hasher, value.samples)
+    elif isinstance(value, (tuple, list)):
+        update(type(value).__name__, str(len(value)).encode())
+        for item in value:
+            hash_fit_input(hasher, item)
+    elif isinstance(value, dict):
+        update("dict", str(len(value)).encode())
+        for key, item in sorted(value.items()):
+            hash_fit_input(hasher, key)
+            hash_fit_input(hasher, item)
+    elif isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        update("ndarray", f"{value.dtype.str}{value.shape}".encode())
+        update("data", value.tobytes())
+    else:
+        update(type(value).__name__, repr(value).encode())
+
+
+def code_version(fit_function):
+    """
+    Hash of the versions of the fitting libraries
+    and of the source code that a fit function depends on.
+    """
+    hasher = hashlib.sha256()
+    for library in cf, gv, lsqfit:
+        hasher.update(f"{library.__name__} {library.__version__};".encode())
+    filenames = {
+        __file__,
+        sys.modules[fit_function.__module__].__file__,
+        sys.modules[BootstrapSampleSet.__module__].__file__,
+    }
+    for filename in sorted(filenames):
+        with open(filename, "rb") as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def cached_fit(fit_function):
+    """
+    Look up the result of fit_function in the fit cache, if one is enabled,
+    before computing it.
+    The key covers the input samples (and hence their covariance),
+    the fit window, the model, and the code version.
+    The worker count does not change the result, so does not form part of it.
+    """
+
+    signature = inspect.signature(fit_function)
+
+    @wraps(fit_function)
+    def wrapper(*args, **kwargs):
+        cache = get_fit_cache()
+        if cache is None:
+            return fit_function(*args, **kwargs)
+
+        # Bind arguments so that positional, keyword and default values
+        # of the same call all give the same key
+        arguments = signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+
+        hasher = hashlib.sha256()
+        hash_fit_input(hasher, f"{fit_function.__module__}.{fit_function.__name__}")
+        hash_fit_input(hasher, code_version(fit_function))
+        for name, value in arguments.arguments.items():
+            if name != "num_workers":
+                hash_fit_input(hasher, (name, value))
+        key = hasher.hexdigest()
+
+        result = cache.load(key)
+        if result is None:
+            result = fit_function(*args, **kwargs)
+            cache.store(key, result)
+        return result
+
+    return wrapper
+
+
+def whitening_matrix(covariance, svdcut=None):
+    """
+    Return a matrix W such that W @ covariance @ W.T is the identity.
+    Without an svdcut this is the inverse Cholesky factor of the covariance.
+    With one, as in gvar.svd, eigenvalues of the correlation matrix
+    smaller than svdcut times the largest are raised to that value first,
+    so that W @ covariance @ W.T is only approximately the identity.
+    """
+    if not svdcut:
+        return np.linalg.inv(np.linalg.cholesky(covariance))
+
+    scale = np.sqrt(np.diag(covariance))
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance / np.outer(scale, scale))
+    eigenvalues = np.maximum(eigenvalues, svdcut * eigenvalues.max())
+    return (eigenvectors / np.sqrt(eigenvalues)).T / scale
+
+
+def solve_rows(matrices, vectors):
+    """
+    Solve matrices[n] @ x[n] = vectors[n] for every n,
+    giving NaN for any system that is singular.
+    """
+    try:
+        return np.linalg.solve(matrices, vectors[..., np.newaxis])[..., 0]
+    except np.linalg.LinAlgError:
+        solutions = np.full(vectors.shape, np.nan)
+        for index, (matrix, vector) in enumerate(zip(matrices, vectors)):
+            try:
+                solutions[index] = np.linalg.solve(matrix, vector)
+            except np.linalg.LinAlgError:
+                pass
+        return solutions
+
+
+def log_failed_fits(chi2, description):
+    """Warn of any fits that batched_levenberg_marquardt could not perform."""
+    num_failed = np.count_nonzero(~np.isfinite(chi2))
+    if num_failed:
+        logging.warning(
+            f"{num_failed} of {np.size(chi2)} {description} failed; "
+            "their parameters are NaN"
+        )
+
+
+def batched_levenberg_marquardt(
+    model, jacobian, y, whitening, p0, x=None, max_iterations=200, tolerance=1e-10
+):
+    """
+    Minimise the correlated chi-square separately for every row of y,
+    iterating all rows together.
+
+    model(p) maps parameters of shape (N, n_par) to predictions (N, n_data),
+    and jacobian(p) gives the derivatives with shape (N, n_data, n_par).
+    If the independent variable differs between rows,
+    it is passed as x with shape (N, n_data),
+    and the functions are called as model(x, p) and jacobian(x, p).
+    All rows share the same whitening matrix (see whitening_matrix),
+    so the covariance is factorised only once.
+    Rows that have converged are dropped from subsequent iterations.
+    Rows that cannot be fitted, because their data or starting point
+    give a non-finite chi-square or their step cannot be solved for,
+    are returned with NaN parameters and infinite chi-square,
+    for callers to drop or flag (see log_failed_fits).
+    Returns the best-fit parameters and chi-square of each row.
+    """
+    y = np.atleast_2d(y)
+    num_rows = len(y)
+    p = np.array(np.broadcast_to(p0, (num_rows, np.shape(p0)[-1])), dtype=float)
+    identity = np.eye(p.shape[1])
+
+    def evaluate(function, p_rows, rows):
+        return function(p_rows) if x is None else function(x[rows], p_rows)
+
+    residuals = (y - evaluate(model, p, slice(None))) @ whitening.T
+    chi2 = (residuals**2).sum(axis=1)
+    damping = np.full(num_rows, 1e-3)
+    active = np.isfinite(chi2)
+    p[~active] = np.nan
+    chi2[~active] = np.inf
+
+    for _ in range(max_iterations):
+        rows = np.flatnonzero(active)
+        if len(rows) == 0:
+            break
+
+        J = whitening @ evaluate(jacobian, p[rows], rows)
+        JtJ = np.swapaxes(J, 1, 2) @ J
+        Jtr = np.einsum("nij,ni->nj", J, residuals[rows])
+        scaled_diagonal = damping[rows, None, None] * JtJ * identity
+        step = solve_rows(JtJ + scaled_diagonal, Jtr)
+
+        failed = ~np.isfinite(step).all(axis=1)
+        p[rows[failed]] = np.nan
+        chi2[rows[failed]] = np.inf
+        active[rows[failed]] = False
+        rows, step = rows[~failed], step[~failed]
+
+        trial_p = p[rows] + step
+        trial_residuals = (y[rows] - evaluate(model, trial_p, rows)) @ whitening.T
+        trial_chi2 = (trial_residuals**2).sum(axis=1)
+
+        improved = trial_chi2 <= chi2[rows]
+        accepted = rows[improved]
+        p[accepted] = trial_p[improved]
+        residuals[accepted] = trial_residuals[improved]
+        chi2[accepted] = trial_chi2[improved]
+        damping[accepted] /= 10
+        damping[rows[~improved]] *= 10
+
+        small_step = np.all(
+            np.abs(step) <= tolerance * (np.abs(trial_p) + tolerance), axis=1
+        )
+        converged = (improved & small_step) | (damping[rows] > 1e16)
+        active[rows[converged]] = False
+
+    return p, chi2
+
+
 def make_models(tmin, tmax, tp):
     """Create corrfitter model for G(t)."""
     return [cf.Corr2(datatag="Gab", tp=tp, tmin=tmin, tmax=tmax, a="a", b="a", dE="dE")]
@@ -35,7 +428,16 @@ def first_fit_parameters(fit):
 
 
 def fit_correlator_without_bootstrap(
-    data_corr, t_lattice, tmin, tmax, Nmax, tp, p0, plotting=False, printing=False
+    data_corr,
+    t_lattice,
+    tmin,
+    tmax,
+    Nmax,
+    tp,
+    p0,
+    plotting=False,
+    printing=False,
+    svdcut=1e-12,
 ):
     t_lattice = abs(t_lattice)
 
@@ -43,7 +445,7 @@ def fit_correlator_without_bootstrap(
 
     for N in range(1, Nmax + 1):
         prior = sigle_state_prior(N)
-        fit = fitter.lsqfit(data=data_corr, prior=prior, p0=p0)
+        fit = fitter.lsqfit(data=data_corr, prior=prior, p0=p0, svdcut=svdcut)
         p0 = fit.pmean
 
         if printing:
@@ -57,6 +459,118 @@ def fit_correlator_without_bootstrap(
     return E, a, chi2, dof
 
 
+def whitened_fit_data(models, covariances, svdcut=1e-12):
+    """
+    Prepare a correlated fit of the corrfitter models
+    to be repeated on many bootstrap samples.
+    covariances maps each datatag to the covariance of its correlator.
+    Returns the matrix projecting the correlators,
+    concatenated in the order of covariances,
+    onto the data corrfitter fits (the window, folded if periodic),
+    and the whitening matrix (see whitening_matrix) of that data.
+    As in lsqfit, the SVD cut is applied block by block
+    to the covariance of the windowed data,
+    which is factorised only once for all the samples.
+    """
+    fitter = cf.CorrFitter(models=models)
+    data = {
+        datatag: gv.gvar(np.zeros(len(covariance)), covariance)
+        for datatag, covariance in covariances.items()
+    }
+    y = fitter.builddata(data=data).buf
+
+    # corrfitter folds with a weighted average, which is linear in the data
+    # with weights depending only on the covariance,
+    # so the projection is read off by shifting the data.
+    # Elements that no windowed point depends on together are shifted at once.
+    unit_data = {
+        datatag: gv.gvar(np.zeros(len(covariance)), np.ones(len(covariance)))
+        for datatag, covariance in covariances.items()
+    }
+    dependence = (
+        gv.deriv(
+            fitter.builddata(data=unit_data).buf,
+            np.concatenate(list(unit_data.values())),
+        )
+        != 0
+    )
+    probes = []
+    for column in np.flatnonzero(dependence.any(axis=0)):
+        for probe in probes:
+            if not (dependence[:, probe].any(axis=1) & dependence[:, column]).any():
+                probe.append(column)
+                break
+        else:
+            probes.append([column])
+
+    splits = np.cumsum([len(values) for values in data.values()])[:-1]
+    projection = np.zeros(dependence.shape)
+    for probe in probes:
+        shift = np.zeros(dependence.shape[1])
+        shift[probe] = 1
+        shifted_data = {
+            datatag: values + datatag_shift
+            for (datatag, values), datatag_shift in zip(
+                data.items(), np.split(shift, splits)
+            )
+        }
+        response = gv.mean(fitter.builddata(data=shifted_data).buf)
+        for column in probe:
+            rows = dependence[:, column]
+            projection[rows, column] = response[rows]
+
+    whitening = np.zeros((len(y), len(y)))
+    for indices, block in gv.evalcov_blocks(y):
+        whitening[indices[:, np.newaxis], indices] = whitening_matrix(block, svdcut)
+    return projection, whitening
+
+
+@lru_cache(maxsize=8)
+def corrfitter_fit_function(model_builder, *model_args):
+    """Build the fit function of model_builder(*model_args) once per process."""
+    return cf.CorrFitter(models=model_builder(*model_args)).buildfitfcn()
+
+
+def fit_whitened_sample(
+    sample, projection, whitening, model_builder, model_args, prior, p0
+):
+    """
+    Fit a single sample of correlators (concatenated as for whitened_fit_data)
+    with the models model_builder(*model_args),
+    minimising the whitened residuals so that the covariance is not
+    rebuilt or factorised for each sample.
+    """
+    fit_function = corrfitter_fit_function(model_builder, *model_args)
+    y = whitening @ (projection @ sample)
+    return lsqfit.nonlinear_fit(
+        data=gv.gvar(y, np.ones_like(y)),
+        fcn=lambda p: whitening @ fit_function(p).buf,
+        prior=prior,
+        p0=p0,
+    )
+
+
+def fit_correlator_sample(
+    C_sample, projection, whitening, plateau_start, plateau_end, tp, p0
+):
+    """
+    Fit a single bootstrap sample of a correlator, returning E, a, chi2/dof.
+    projection and whitening are the output of whitened_fit_data
+    for make_models(plateau_start, plateau_end, tp).
+    """
+    fit = fit_whitened_sample(
+        C_sample,
+        projection,
+        whitening,
+        make_models,
+        (plateau_start, plateau_end, tp),
+        sigle_state_prior(1),
+        p0,
+    )
+    E, a, chi2, dof = first_fit_parameters(fit)
+    return gv.mean(E[0]), gv.mean(a[0]), chi2 / dof
+
+
 def fit_exp_std(C_boot, plateau_start, plateau_end):
     """
     This function fits the mean correlators with a exp function
@@ -139,12 +653,12 @@ def fit_cosh_std(C_boot, plateau_start, plateau_end, lattice_t):
     return gv.mean(E[0]), gv.sdev(E[0]), chi2 / dof
 
 
-def fit_cosh_bootstrap(C, plateau_start, plateau_end):
+@cached_fit
+def fit_cosh_bootstrap(C, plateau_start, plateau_end, num_workers=None, svdcut=1e-12):
     """This function fits the correlators with a cosh function"""
 
     C_boot = C.samples
 
-    num_sample = C_boot.shape[0]
     lattice_t = C_boot.shape[1]
 
     def func(t, a, M):
@@ -160,52 +674,34 @@ def fit_cosh_bootstrap(C, plateau_start, plateau_end):
         {"log(a)": np.array([np.log(abs(x0[0]))]), "log(dE)": np.array([np.log(x0[1])])}
     )
 
-    E_sample = np.zeros(num_sample)
-    a_sample = np.zeros(num_sample)
-    chi2_dof = np.zeros(num_sample)
-
-    cov = np.cov(C_boot.T)
-
-    for n in range(num_sample):
-        correlator_set = dict(Gab=gv.gvar(C_boot[n], cov))
-
-        E, a, chi2, dof = fit_correlator_without_bootstrap(
-            correlator_set,
-            0,
-            plateau_start,
-            plateau_end,
-            1,
-            lattice_t,
-            p0,
-            plotting=False,
-            printing=False,
-        )
-        E_sample[n] = gv.mean(E[0])
-        a_sample[n] = gv.mean(a[0])
-        chi2_dof[n] = chi2 / dof
-
-    correlator_set = dict(Gab=gv.gvar(C.mean[0], cov))
-    E_mean, a_mean, chi2, dof = fit_correlator_without_bootstrap(
-        correlator_set,
-        0,
-        plateau_start,
-        plateau_end,
-        1,
-        lattice_t,
-        p0,
-        plotting=False,
-        printing=False,
+    fit_data = whitened_fit_data(
+        make_models(plateau_start, plateau_end, lattice_t),
+        dict(Gab=C.covariance()),
+        svdcut=svdcut,
     )
-
-    E_fit = BootstrapSampleSet(gv.mean(E_mean[0]), E_sample)
-    A_fit = BootstrapSampleSet(
-        gv.mean(a_mean[0]) / np.sqrt(gv.mean(E_mean[0])), a_sample / np.sqrt(E_sample)
+    fit_function = partial(
+        fit_correlator_sample,
+        projection=fit_data[0],
+        whitening=fit_data[1],
+        plateau_start=plateau_start,
+        plateau_end=plateau_end,
+        tp=lattice_t,
+        p0=p0,
     )
 
-    return E_fit, A_fit, chi2 / dof
+    E_sample, a_sample, chi2_dof = np.asarray(
+        map_samples(fit_function, C_boot, num_workers=num_workers)
+    ).T
+    E_mean, a_mean, chi2_dof_mean = fit_function(C.mean[0])
+
+    E_fit = type(C)(E_mean, E_sample)
+    A_fit = type(C)(a_mean / np.sqrt(E_mean), a_sample / np.sqrt(E_sample))
 
+    return E_fit, A_fit, chi2_dof_mean
 
-def fit_exp_bootstrap(C, plateau_start, plateau_end):
+
+@cached_fit
+def fit_exp_bootstrap(C, plateau_start, plateau_end, num_workers=None, svdcut=1e-12):
     """This function fits the correlators with a exp function"""
 
     C_boot = C.samples
@@ -223,52 +719,30 @@ def fit_exp_bootstrap(C, plateau_start, plateau_end):
         {"log(a)": np.array([np.log(abs(x0[0]))]), "log(dE)": np.array([np.log(x0[1])])}
     )
 
-    # load the ensamble info
-    num_sample = C_boot.shape[0]
-
-    E_sample = np.zeros(num_sample)
-    a_sample = np.zeros(num_sample)
-    chi2_dof = np.zeros(num_sample)
-
-    cov = np.cov(C_boot.T)
-
-    for n in range(num_sample):
-        correlator_set = dict(Gab=gv.gvar(C_boot[n], cov))
-
-        E, a, chi2, dof = fit_correlator_without_bootstrap(
-            correlator_set,
-            0,
-            plateau_start,
-            plateau_end,
-            1,
-            None,
-            p0,
-            plotting=False,
-            printing=False,
-        )
-        E_sample[n] = gv.mean(E[0])
-        a_sample[n] = gv.mean(a[0])
-        chi2_dof[n] = chi2 / dof
-
-    correlator_set = dict(Gab=gv.gvar(C.mean[0], cov))
-    E_mean, a_mean, chi2, dof = fit_correlator_without_bootstrap(
-        correlator_set,
-        0,
-        plateau_start,
-        plateau_end,
-        1,
-        None,
-        p0,
-        plotting=False,
-        printing=False,
+    fit_data = whitened_fit_data(
+        make_models(plateau_start, plateau_end, None),
+        dict(Gab=C.covariance()),
+        svdcut=svdcut,
     )
-
-    E_fit = BootstrapSampleSet(gv.mean(E_mean[0]), E_sample)
-    A_fit = BootstrapSampleSet(
-        gv.mean(a_mean[0]) / np.sqrt(gv.mean(E_mean[0])), a_sample / np.sqrt(E_sample)
+    fit_function = partial(
+        fit_correlator_sample,
+        projection=fit_data[0],
+        whitening=fit_data[1],
+        plateau_start=plateau_start,
+        plateau_end=plateau_end,
+        tp=None,
+        p0=p0,
     )
 
-    return E_fit, A_fit, chi2 / dof
+    E_sample, a_sample, chi2_dof = np.asarray(
+        map_samples(fit_function, C_boot, num_workers=num_workers)
+    ).T
+    E_mean, a_mean, chi2_dof_mean = fit_function(C.mean[0])
+
+    E_fit = type(C)(E_mean, E_sample)
+    A_fit = type(C)(a_mean / np.sqrt(E_mean), a_sample / np.sqrt(E_sample))
+
+    return E_fit, A_fit, chi2_dof_mean
 
 
 def simultaneous_model(T, tmin, tmax, tp):
@@ -300,14 +774,23 @@ def simultaneous_fit_parameters(fit):
 
 
 def fit_correlator_simultaneous(
-    data_corrs, T, tmin, tmax, Nmax, tp, p0, plotting=False, printing=False
+    data_corrs,
+    T,
+    tmin,
+    tmax,
+    Nmax,
+    tp,
+    p0,
+    plotting=False,
+    printing=False,
+    svdcut=1e-12,
 ):
     T = abs(T)
 
     fitter = cf.CorrFitter(models=simultaneous_model(T, tmin, tmax, tp))
     for N in range(1, Nmax + 1):
         prior = simultaneous_prior(N)
-        fit = fitter.lsqfit(data=data_corrs, prior=prior, p0=p0)
+        fit = fitter.lsqfit(data=data_corrs, prior=prior, p0=p0, svdcut=svdcut)
         p0 = fit.pmean
 
         if printing:
@@ -322,7 +805,38 @@ def fit_correlator_simultaneous(
     return E, a, b, chi2, dof
 
 
-def fit_coshsinh_simultaneous(Corr_ss, Corr_sp, plateau_start, plateau_end, lattice_t):
+def fit_correlator_simultaneous_sample(
+    Css_sample, Csp_sample, projection, whitening, plateau_start, plateau_end, tp, p0
+):
+    """
+    Fit a single bootstrap sample of a pair of correlators simultaneously,
+    returning E, a, b, chi2/dof.
+    projection and whitening are the output of whitened_fit_data
+    for simultaneous_model, with covariances for Gab then Gaa.
+    """
+    fit = fit_whitened_sample(
+        np.concatenate([Csp_sample, Css_sample]),
+        projection,
+        whitening,
+        simultaneous_model,
+        (0, plateau_start, plateau_end, tp),
+        simultaneous_prior(1),
+        p0,
+    )
+    E, a, b, chi2, dof = simultaneous_fit_parameters(fit)
+    return gv.mean(E[0]), gv.mean(a[0]), gv.mean(b[0]), chi2 / dof
+
+
+@cached_fit
+def fit_coshsinh_simultaneous(
+    Corr_ss,
+    Corr_sp,
+    plateau_start,
+    plateau_end,
+    lattice_t,
+    num_workers=None,
+    svdcut=1e-12,
+):
     """This function fits the correlators with cosh and sinh functions simultaneously"""
 
     x0 = sim_coshsinh_fit(
@@ -341,57 +855,32 @@ def fit_coshsinh_simultaneous(Corr_ss, Corr_sp, plateau_start, plateau_end, latt
     Css = Corr_ss.samples
     Csp = Corr_sp.samples
 
-    num_sample = Css.shape[0]
-
-    E_sample = np.zeros(num_sample)
-    a_sample = np.zeros(num_sample)
-    b_sample = np.zeros(num_sample)
-    chi2_dof = np.zeros(num_sample)
-
-    cov_ss = np.cov(Css.T)
-    cov_sp = np.cov(Csp.T)
-
-    for n in range(num_sample):
-        correlator_set = dict(Gab=gv.gvar(Csp[n], cov_sp), Gaa=gv.gvar(Css[n], cov_ss))
-
-        E, a, b, chi2, dof = fit_correlator_simultaneous(
-            correlator_set,
-            0,
-            plateau_start,
-            plateau_end,
-            1,
-            lattice_t,
-            p0,
-            plotting=False,
-            printing=False,
-        )
-        E_sample[n] = gv.mean(E[0])
-        a_sample[n] = gv.mean(a[0])
-        b_sample[n] = gv.mean(b[0])
-        chi2_dof[n] = chi2 / dof
-
-    correlator_set = dict(
-        Gab=gv.gvar(Corr_sp.mean[0], cov_sp), Gaa=gv.gvar(Corr_ss.mean[0], cov_ss)
+    fit_data = whitened_fit_data(
+        simultaneous_model(lattice_t, plateau_start, plateau_end, lattice_t),
+        dict(Gab=Corr_sp.covariance(), Gaa=Corr_ss.covariance()),
+        svdcut=svdcut,
     )
-
-    E_mean, a_mean, b_mean, chi2, dof = fit_correlator_simultaneous(
-        correlator_set,
-        0,
-        plateau_start,
-        plateau_end,
-        1,
-        lattice_t,
-        p0,
-        plotting=False,
-        printing=False,
+    fit_function = partial(
+        fit_correlator_simultaneous_sample,
+        projection=fit_data[0],
+        whitening=fit_data[1],
+        plateau_start=plateau_start,
+        plateau_end=plateau_end,
+        tp=lattice_t,
+        p0=p0,
     )
 
-    E_fit = BootstrapSampleSet(gv.mean(E_mean[0]), E_sample)
-    A_fit = BootstrapSampleSet(
-        gv.mean(b_mean[0]) / np.sqrt(gv.mean(E_mean[0])), b_sample / np.sqrt(E_sample)
+    E_sample, a_sample, b_sample, chi2_dof = np.asarray(
+        map_samples(fit_function, Css, Csp, num_workers=num_workers)
+    ).T
+    E_mean, a_mean, b_mean, chi2_dof_mean = fit_function(
+        Corr_ss.mean[0], Corr_sp.mean[0]
     )
 
-    return E_fit, A_fit, chi2 / dof
+    E_fit = type(Corr_ss)(E_mean, E_sample)
+    A_fit = type(Corr_ss)(b_mean / np.sqrt(E_mean), b_sample / np.sqrt(E_sample))
+
+    return E_fit, A_fit, chi2_dof_mean
 
 
 def sim_coshsinh_fit(C1, C2, T, ti, tf):
@@ -498,6 +987,55 @@ def mass_square_fit_form(mass, a, b, c, lat_a):
     return a * (1 + b * mass) + c * lat_a
 
 
+def linear_fit_design(x):
+    return np.stack([np.ones_like(x), x], axis=-1)
+
+
+def quadratic_fit_design(x):
+    return np.stack([np.ones_like(x), x, x**2], axis=-1)
+
+
+def mass_square_fit_jacobian(mass, a, b, c, lat_a):
+    return np.stack(np.broadcast_arrays(1 + b * mass, a * mass, lat_a), axis=-1)
+
+
+# Derivatives of nonlinear fit forms with respect to their parameters
+fit_form_jacobians = {mass_square_fit_form: mass_square_fit_jacobian}
+
+
+def finite_difference_jacobian(fit_form, x, *pars, relative_step=1e-6):
+    """Central-difference derivatives of fit_form with respect to its parameters."""
+    derivatives = []
+    for index, par in enumerate(pars):
+        step = relative_step * np.maximum(np.abs(par), 1)
+        shifted_up = [*pars[:index], par + step, *pars[index + 1 :]]
+        shifted_down = [*pars[:index], par - step, *pars[index + 1 :]]
+        derivatives.append(
+            (fit_form(x, *shifted_up) - fit_form(x, *shifted_down)) / (2 * step)
+        )
+    return np.stack(np.broadcast_arrays(*derivatives), axis=-1)
+
+
+def get_fit_form_jacobian(fit_form):
+    """
+    Jacobian of fit_form with respect to its parameters;
+    analytic if one is known, otherwise by finite differences.
+    """
+    if isinstance(fit_form, partial) and fit_form.func in fit_form_jacobians:
+        return partial(fit_form_jacobians[fit_form.func], **fit_form.keywords)
+    if fit_form in fit_form_jacobians:
+        return fit_form_jacobians[fit_form]
+    return partial(finite_difference_jacobian, fit_form)
+
+
+# Fit forms that are linear in their parameters,
+# and the design matrices that express them as X @ parameters
+linear_fit_designs = {
+    linear_fit_form: linear_fit_design,
+    quadratic_fit_form: quadratic_fit_design,
+}
+
+
 def diagonal_covariance(data):
     result = np.zeros(shape=(len(data), len(data)))
     np.fill_diagonal(result, np.var(data, axis=1))
@@ -505,6 +1043,15 @@ def diagonal_covariance(data):
 
 
 def split_means_samples(sample_sets):
+    """
+    Split data into an array of means and an (n_points, N_boot) array of samples.
+    sample_sets is either a column of a BootstrapTable,
+    whose samples are used without copying,
+    or a sequence of scalar BootstrapSampleSets.
+    """
+    if isinstance(sample_sets, BootstrapSampleSet):
+        return np.asarray(sample_sets.mean), sample_sets.samples.T
+
     means = []
     samples = []
     for datum in sample_sets:
@@ -515,40 +1062,118 @@ def split_means_samples(sample_sets):
     return np.asarray([datum.samples for datum in sample_sets])
 
 
-def global_meson_fit(fit_form, x_data, y_data):
+def sample_set_type(sample_sets):
+    """The type of a column or sequence of sample sets."""
+    if isinstance(sample_sets, BootstrapSampleSet):
+        return type(sample_sets)
+    return type(sample_sets[0])
+
+
+def global_chisquare(pars, fit_form, y_sample, x_sample, inverse_covariance):
+    V = y_sample - fit_form(x_sample, *pars)
+    return V @ inverse_covariance @ V.T
+
+
+def global_fit_sample(x_sample, y_sample, fit_form, inverse_covariance, x0):
+    return minimize(
+        partial(
+            global_chisquare,
+            fit_form=fit_form,
+            y_sample=y_sample,
+            x_sample=x_sample,
+            inverse_covariance=inverse_covariance,
+        ),
+        x0,
+        method="Nelder-Mead",
+        tol=10**-16,
+    ).x
+
+
+def batched_linear_least_squares(design, x_samples, y_samples, inverse_covariance):
+    """
+    Solve the weighted normal equations for every bootstrap sample at once.
+    x_samples and y_samples have shape (n_points, N_boot);
+    returns the best-fit parameters with shape (N_boot, n_parameters).
+    """
+    X = design(x_samples.T)
+    XtW = np.swapaxes(X, 1, 2) @ inverse_covariance
+    return np.linalg.solve(XtW @ X, XtW @ y_samples.T[..., None])[..., 0]
+
+
+def batched_nonlinear_least_squares(fit_form, x_samples, y_samples, covariance, x0):
+    """
+    Fit a nonlinear form to every bootstrap sample at once by Gauss-Newton
+    (Levenberg-Marquardt) iteration.
+    x_samples and y_samples have shape (n_points, N_boot);
+    returns the best-fit parameters with shape (N_boot, n_parameters).
+    """
+    fit_form_jacobian = get_fit_form_jacobian(fit_form)
+
+    def model(x, p):
+        return fit_form(x, *p.T[..., None])
+
+    def jacobian(x, p):
+        return fit_form_jacobian(x, *p.T[..., None])
+
+    result_samples, chi2 = batched_levenberg_marquardt(
+        model, jacobian, y_samples.T, whitening_matrix(covariance), x0, x=x_samples.T
+    )
+    log_failed_fits(chi2, "bootstrap sample fits")
+    return result_samples
+
+
+def global_meson_fit(fit_form, x_data, y_data, num_workers=None, method="gauss-newton"):
+    """
+    Fit fit_form to each bootstrap sample of the data.
+    x_data and y_data are columns of a BootstrapTable,
+    or sequences of scalar BootstrapSampleSets.
+    Forms linear in their parameters are solved in closed form;
+    others use batched Gauss-Newton iteration,
+    or per-sample Nelder-Mead minimisation if method is "nelder-mead".
+    """
     x_means, x_samples = split_means_samples(x_data)
     y_means, y_samples = split_means_samples(y_data)
+    set_type = sample_set_type(y_data)
 
-    x0, _ = curve_fit(fit_form, x_means, y_means)
-    inverse_covariance = np.linalg.inv(diagonal_covariance(y_samples))
-
-    def chisquare(pars, y_sample, x_sample, inverse_covariance):
-        V = y_sample - fit_form(x_sample, *pars)
-        return V @ inverse_covariance @ V.T
+    # Taken from the sample set, so that the jackknife variance is scaled correctly
+    covariance = np.diag(set_type(y_means, y_samples.T).std() ** 2)
+    inverse_covariance = np.linalg.inv(covariance)
 
-    result_samples = np.asarray(
-        [
-            minimize(
+    if fit_form in linear_fit_designs:
+        result_samples = batched_linear_least_squares(
+            linear_fit_designs[fit_form], x_samples, y_samples, inverse_covariance
+        )
+    elif method == "gauss-newton":
+        x0, _ = curve_fit(fit_form, x_means, y_means)
+        result_samples = batched_nonlinear_least_squares(
+            fit_form, x_samples, y_samples, covariance, x0
+        )
+    elif method == "nelder-mead":
+        x0, _ = curve_fit(fit_form, x_means, y_means)
+        result_samples = np.asarray(
+            map_samples(
                 partial(
-                    chisquare,
-                    y_sample=y_sample,
-                    x_sample=x_sample,
+                    global_fit_sample,
+                    fit_form=fit_form,
                     inverse_covariance=inverse_covariance,
+                    x0=x0,
                 ),
-                x0,
-                method="Nelder-Mead",
-                tol=10**-16,
-            ).x
-            for x_sample, y_sample in zip(x_samples.T, y_samples.T)
-        ]
-    )
+                x_samples.T,
+                y_samples.T,
+                num_workers=num_workers,
+            )
+        )
+    else:
+        raise ValueError(f"Unknown fit method {method}")
 
     results = [
-        BootstrapSampleSet(parameter_samples.mean(), parameter_samples)
+        set_type(parameter_samples.mean(), parameter_samples)
         for parameter_samples in result_samples.T
     ]
 
     central_results = [result.mean for result in results]
-    chisquare_value = chisquare(central_results, y_means, x_means, inverse_covariance)
+    chisquare_value = global_chisquare(
+        central_results, fit_form, y_means, x_means, inverse_covariance
+    )
 
-    return results, chisquare_value / (len(x_data) - len(results) - 1)
+    return results, chisquare_value / (len(x_means) - len(results) - 1)
@@ -0,0 +1,456 @@
+import logging
+
+import numpy as np
+from scipy.linalg import block_diag
+from scipy.optimize import curve_fit
+
+from .fitting import (
+    batched_levenberg_marquardt,
+    cached_fit,
+    log_failed_fits,
+    sim_coshsinh_fit,
+    whitening_matrix,
+)
+
+
+def fit_window_projection(covariance, tmin, tmax, tp):
+    """
+    Matrix selecting the time slices tmin to tmax (inclusive) used in a fit.
+    For a periodic (tp > 0) or antiperiodic (tp < 0) fit, time slices beyond
+    the midpoint are dropped, and each remaining one is replaced by its
+    covariance-weighted average with (plus or minus) its mirror image,
+    following the convention of corrfitter.Corr2.
+    """
+    lattice_t = len(covariance)
+    if tp is not None:
+        tmax = min(tmax, abs(tp) // 2)
+
+    time_slices = np.arange(tmin, tmax + 1)
+    projection = np.zeros((len(time_slices), lattice_t))
+    sign = np.sign(tp) if tp is not None else 0
+    for row, t in enumerate(time_slices):
+        if tp is None or t == 0 or 2 * t == abs(tp):
+            projection[row, t] = 1
+            continue
+
+        pair = [t, abs(tp) - t]
+        pair_covariance = covariance[np.ix_(pair, pair)] * [[1, sign], [sign, 1]]
+        weights = np.linalg.pinv(pair_covariance).sum(axis=1)
+        projection[row, pair] = weights / weights.sum() * [1, sign]
+
+    return time_slices, projection
+
+
+def single_state_model(t, tp):
+    """
+    Model and Jacobian for a single state a**2 * f(E, t),
+    in terms of the parameters log(a) and log(E).
+    """
+
+    def model(p):
+        a = np.exp(p[:, 0:1])
+        E = np.exp(p[:, 1:2])
+        if tp is None:
+            return a**2 * np.exp(-E * t)
+        return a**2 * (np.exp(-E * t) + np.exp(-E * (tp - t)))
+
+    def jacobian(p):
+        a = np.exp(p[:, 0:1])
+        E = np.exp(p[:, 1:2])
+        if tp is None:
+            f = np.exp(-E * t)
+            df_dE = -t * f
+        else:
+            f = np.exp(-E * t) + np.exp(-E * (tp - t))
+            df_dE = -t * np.exp(-E * t) - (tp - t) * np.exp(-E * (tp - t))
+        return np.stack([2 * a**2 * f, a**2 * E * df_dE], axis=-1)
+
+    return model, jacobian
+
+
+def single_state_initial_parameters(C, plateau_start, plateau_end, initial_form):
+    x0, _ = curve_fit(
+        initial_form,
+        np.arange(plateau_start, plateau_end),
+        C.mean[0, plateau_start:plateau_end],
+    )
+    # Convert the curve_fit amplitude to the a**2 * f(E, t) normalisation
+    return np.log([abs(x0[0]) * np.sqrt(abs(x0[1]) / 2), abs(x0[1])])
+
+
+def single_state_window_fit(
+    C, covariance, plateau_start, plateau_end, tp, p0, svdcut=1e-12
+):
+    """
+    Fit a single state to all bootstrap samples of C in one fit window,
+    starting from the parameters p0 = [log(a), log(E)].
+    The covariance matrix is factorised once, with an optional SVD cut,
+    and the factor shared by the central and all bootstrap fits.
+    Returns E, A, the chi-square of the central fit,
+    the number of points fitted, and the central fit parameters.
+    """
+    time_slices, projection = fit_window_projection(
+        covariance, plateau_start, plateau_end, tp
+    )
+    model, jacobian = single_state_model(time_slices, tp)
+
+    y_samples = C.samples @ projection.T
+    y_mean = C.mean[0] @ projection.T
+    whitening = whitening_matrix(projection @ covariance @ projection.T, svdcut)
+
+    p_mean, (chi2,) = batched_levenberg_marquardt(
+        model, jacobian, y_mean, whitening, p0
+    )
+    log_failed_fits(chi2, "central fit")
+    p_samples, chi2_samples = batched_levenberg_marquardt(
+        model, jacobian, y_samples, whitening, p_mean[0] if np.isfinite(chi2) else p0
+    )
+    log_failed_fits(chi2_samples, "bootstrap sample fits")
+
+    a_mean, E_mean = np.exp(p_mean[0])
+    a_sample, E_sample = np.exp(p_samples.T)
+
+    E_fit = type(C)(E_mean, E_sample)
+    A_fit = type(C)(a_mean / np.sqrt(E_mean), a_sample / np.sqrt(E_sample))
+
+    return E_fit, A_fit, chi2, len(time_slices), p_mean[0]
+
+
+def single_state_bootstrap(
+    C, plateau_start, plateau_end, tp, initial_form, svdcut=1e-12
+):
+    p0 = single_state_initial_parameters(C, plateau_start, plateau_end, initial_form)
+    E_fit, A_fit, chi2, num_points, _ = single_state_window_fit(
+        C, C.covariance(), plateau_start, plateau_end, tp, p0, svdcut=svdcut
+    )
+
+    # As in lsqfit, the two unconstrained priors each count as a data point
+    return E_fit, A_fit, chi2 / num_points
+
+
+def cosh_initial_form(lattice_t):
+    def func(t, a, M):
+        return a * a * M * (np.exp(-M * t) + np.exp(-M * (lattice_t - t))) / 2
+
+    return func
+
+
+@cached_fit
+def fit_cosh_bootstrap(C, plateau_start, plateau_end, svdcut=1e-12):
+    """
+    Fit the correlators with a cosh function,
+    solving for all bootstrap samples at once.
+    """
+    lattice_t = C.samples.shape[1]
+
+    return single_state_bootstrap(
+        C,
+        plateau_start,
+        plateau_end,
+        lattice_t,
+        cosh_initial_form(lattice_t),
+        svdcut=svdcut,
+    )
+
+
+@cached_fit
+def fit_exp_bootstrap(C, plateau_start, plateau_end, svdcut=1e-12):
+    """
+    Fit the correlators with an exp function,
+    solving for all bootstrap samples at once.
+    """
+
+    def func(t, a, M):
+        return a * a * M * (np.exp(-M * t)) / 2
+
+    return single_state_bootstrap(
+        C, plateau_start, plateau_end, None, func, svdcut=svdcut
+    )
+
+
+def coshsinh_model(t, lattice_t):
+    """
+    Model and Jacobian for the simultaneous fit of
+    Gaa = a**2 * cosh-like(E, t) and Gab = a * b * sinh-like(E, t),
+    in terms of the parameters log(a), log(b) and log(E).
+    Predictions for Gaa and Gab are concatenated along the data axis.
+    """
+
+    def model(p):
+        a, b, E = np.exp(p[:, 0:1]), np.exp(p[:, 1:2]), np.exp(p[:, 2:3])
+        forward, backward = np.exp(-E * t), np.exp(-E * (lattice_t - t))
+        return np.concatenate(
+            [a**2 * (forward + backward), a * b * (forward - backward)], axis=1
+        )
+
+    def jacobian(p):
+        a, b, E = np.exp(p[:, 0:1]), np.exp(p[:, 1:2]), np.exp(p[:, 2:3])
+        forward, backward = np.exp(-E * t), np.exp(-E * (lattice_t - t))
+        d_forward, d_backward = -t * forward, -(lattice_t - t) * backward
+        Gaa = a**2 * (forward + backward)
+        Gab = a * b * (forward - backward)
+        return np.stack(
+            [
+                np.concatenate([2 * Gaa, Gab], axis=1),
+                np.concatenate([np.zeros_like(Gaa), Gab], axis=1),
+                np.concatenate(
+                    [
+                        a**2 * E * (d_forward + d_backward),
+                        a * b * E * (d_forward - d_backward),
+                    ],
+                    axis=1,
+                ),
+            ],
+            axis=-1,
+        )
+
+    return model, jacobian
+
+
+def coshsinh_initial_parameters(
+    Corr_ss, Corr_sp, plateau_start, plateau_end, lattice_t
+):
+    As, f, M = sim_coshsinh_fit(
+        Corr_sp.mean[0], Corr_ss.mean[0], lattice_t, plateau_start, plateau_end
+    )
+    # Convert the curve_fit parameters to the corrfitter normalisation
+    a0 = abs(As) / np.sqrt(2 * abs(M))
+    return np.log([a0, abs(As * f) / (2 * a0), abs(M)])
+
+
+def coshsinh_window_fit(
+    Corr_ss,
+    Corr_sp,
+    cov_ss,
+    cov_sp,
+    plateau_start,
+    plateau_end,
+    lattice_t,
+    p0,
+    svdcut=1e-12,
+):
+    """
+    Fit Gaa and Gab simultaneously to all bootstrap samples in one fit window,
+    starting from the parameters p0 = [log(a), log(b), log(E)].
+    Returns E, A, the chi-square of the central fit,
+    the number of points fitted, and the central fit parameters.
+    """
+    time_slices, projection_ss = fit_window_projection(
+        cov_ss, plateau_start, plateau_end, lattice_t
+    )
+    _, projection_sp = fit_window_projection(
+        cov_sp, plateau_start, plateau_end, -lattice_t
+    )
+    model, jacobian = coshsinh_model(time_slices, lattice_t)
+
+    # Gaa and Gab are treated as uncorrelated, so the whitening is block diagonal
+    whitening = block_diag(
+        whitening_matrix(projection_ss @ cov_ss @ projection_ss.T, svdcut),
+        whitening_matrix(projection_sp @ cov_sp @ projection_sp.T, svdcut),
+    )
+    y_samples = np.concatenate(
+        [Corr_ss.samples @ projection_ss.T, Corr_sp.samples @ projection_sp.T], axis=1
+    )
+    y_mean = np.concatenate(
+        [Corr_ss.mean[0] @ projection_ss.T, Corr_sp.mean[0] @ projection_sp.T]
+    )
+
+    p_mean, (chi2,) = batched_levenberg_marquardt(
+        model, jacobian, y_mean, whitening, p0
+    )
+    log_failed_fits(chi2, "central fit")
+    p_samples, chi2_samples = batched_levenberg_marquardt(
+        model, jacobian, y_samples, whitening, p_mean[0] if np.isfinite(chi2) else p0
+    )
+    log_failed_fits(chi2_samples, "bootstrap sample fits")
+
+    _, b_mean, E_mean = np.exp(p_mean[0])
+    _, b_sample, E_sample = np.exp(p_samples.T)
+
+    E_fit = type(Corr_ss)(E_mean, E_sample)
+    A_fit = type(Corr_ss)(b_mean / np.sqrt(E_mean), b_sample / np.sqrt(E_sample))
+
+    return E_fit, A_fit, chi2, len(y_mean), p_mean[0]
+
+
+@cached_fit
+def fit_coshsinh_simultaneous(
+    Corr_ss, Corr_sp, plateau_start, plateau_end, lattice_t, svdcut=1e-12
+):
+    """
+    Fit the correlators with cosh and sinh functions simultaneously,
+    solving for all bootstrap samples at once.
+    """
+    p0 = coshsinh_initial_parameters(
+        Corr_ss, Corr_sp, plateau_start, plateau_end, lattice_t
+    )
+    E_fit, A_fit, chi2, num_points, _ = coshsinh_window_fit(
+        Corr_ss,
+        Corr_sp,
+        Corr_ss.covariance(),
+        Corr_sp.covariance(),
+        plateau_start,
+        plateau_end,
+        lattice_t,
+        p0,
+        svdcut=svdcut,
+    )
+
+    # As in lsqfit, the three unconstrained priors each count as a data point
+    return E_fit, A_fit, chi2 / num_points
+
+
+def admissible_windows(lattice_t, min_length):
+    """
+    All fit windows (tmin, tmax) of at least min_length time slices
+    lying between t = 1 and the midpoint of the lattice.
+    """
+    return [
+        (tmin, tmax)
+        for tmin in range(1, lattice_t // 2 + 1)
+        for tmax in range(tmin + min_length - 1, lattice_t // 2 + 1)
+    ]
+
+
+def model_average(fits, weights):
+    """
+    Weighted average of the sample sets fits,
+    with the spread of their central values between windows,
+    sum(w * E^2) - sum(w * E)^2,
+    added in quadrature to the statistical uncertainty.
+    This is done by scaling the deviations of the averaged samples
+    about their mean, so that correlations with other observables are kept.
+    Returns the average and its statistical and systematic uncertainties.
+    """
+    average = sum(weight * fit for weight, fit in zip(weights, fits))
+    means = np.asarray([fit.mean for fit in fits])
+    systematic = np.sqrt(
+        max(np.sum(weights * means**2) - np.sum(weights * means) ** 2, 0)
+    )
+    statistical = average.std()
+    if statistical == 0:
+        return average, statistical, systematic
+
+    sample_mean = average.samples.mean(axis=0)
+    scale = np.sqrt(1 + (systematic / statistical) ** 2)
+    return (
+        type(average)(
+            average.mean, sample_mean + scale * (average.samples - sample_mean)
+        ),
+        statistical,
+        systematic,
+    )
+
+
+def scan_windows(fit_window, windows, p0, num_parameters):
+    """
+    Fit every window in turn, starting each fit from the result of the
+    previous one, and combine them in an AIC-weighted model average,
+    whose uncertainty includes the spread between windows (see model_average).
+    fit_window(tmin, tmax, p0) returns E, A, chi2, num_points and parameters,
+    as single_state_window_fit does.
+    Returns the averaged E and A, the averaged chi2/dof,
+    and a list of per-window results,
+    followed by a row for the average giving its statistical and
+    systematic uncertainties separately.
+    """
+    window_results = []
+    E_fits = []
+    A_fits = []
+    for tmin, tmax in windows:
+        try:
+            E_fit, A_fit, chi2, num_points, fitted_p = fit_window(tmin, tmax, p0)
+        except np.linalg.LinAlgError:
+            logging.warning(f"Skipping window {tmin}-{tmax}: singular covariance")
+            continue
+        if not np.isfinite(chi2):
+            continue
+
+        p0 = fitted_p
+        E_fits.append(E_fit)
+        A_fits.append(A_fit)
+        window_results.append(
+            {
+                "plateau_start": tmin,
+                "plateau_end": tmax,
+                "mass": E_fit.to_ufloat(),
+                "matrix_element": A_fit.to_ufloat(),
+                "chisquare": chi2 / num_points,
+                # Akaike information criterion, up to a window-independent constant
+                "AIC": chi2 + 2 * num_parameters - 2 * num_points,
+            }
+        )
+
+    if not window_results:
+        raise ValueError("No fit window could be fitted.")
+
+    AIC = np.asarray([result["AIC"] for result in window_results])
+    weights = np.exp(-(AIC - AIC.min()) / 2)
+    weights /= weights.sum()
+    for result, weight in zip(window_results, weights):
+        result["weight"] = weight
+
+    chi2_average = sum(
+        weight * result["chisquare"] for weight, result in zip(weights, window_results)
+    )
+    average_result = {
+        "plateau_start": None,
+        "plateau_end": None,
+        "chisquare": chi2_average,
+        "weight": weights.sum(),
+    }
+    averages = []
+    for name, fits in ("mass", E_fits), ("matrix_element", A_fits):
+        average, statistical, systematic = model_average(fits, weights)
+        averages.append(average)
+        average_result[name] = average.to_ufloat()
+        average_result[f"{name}_statistical_error"] = statistical
+        average_result[f"{name}_systematic_error"] = systematic
+
+    # The last row reports the model average
+    window_results.append(average_result)
+
+    E_average, A_average = averages
+    return E_average, A_average, chi2_average, window_results
+
+
+def scan_cosh_bootstrap(C, min_length=3, svdcut=1e-12):
+    """
+    Fit a cosh function in every admissible plateau window,
+    reusing the covariance matrix and warm-starting from neighbouring windows.
+    """
+    lattice_t = C.samples.shape[1]
+    covariance = C.covariance()
+    p0 = single_state_initial_parameters(
+        C, lattice_t // 4, lattice_t // 2, cosh_initial_form(lattice_t)
+    )
+
+    def fit_window(tmin, tmax, p0):
+        return single_state_window_fit(
+            C, covariance, tmin, tmax, lattice_t, p0, svdcut=svdcut
+        )
+
+    return scan_windows(
+        fit_window, admissible_windows(lattice_t, min_length), p0, num_parameters=2
+    )
+
+
+def scan_coshsinh_simultaneous(Corr_ss, Corr_sp, lattice_t, min_length=3, svdcut=1e-12):
+    """
+    Fit cosh and sinh functions simultaneously in every admissible plateau window,
+    reusing the covariance matrices and warm-starting from neighbouring windows.
+    """
+    cov_ss = Corr_ss.covariance()
+    cov_sp = Corr_sp.covariance()
+    p0 = coshsinh_initial_parameters(
+        Corr_ss, Corr_sp, lattice_t // 4, lattice_t // 2, lattice_t
+    )
+
+    def fit_window(tmin, tmax, p0):
+        return coshsinh_window_fit(
+            Corr_ss, Corr_sp, cov_ss, cov_sp, tmin, tmax, lattice_t, p0, svdcut=svdcut
+        )
+
+    return scan_windows(
+        fit_window, admissible_windows(lattice_t, min_length), p0, num_parameters=3
+    )
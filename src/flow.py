@@ -9,6 +9,7 @@ import h5py
 import numpy as np
 from uncertainties import ufloat
 
+from .bootstrap import sample_jackknife, JackknifeSampleSet
 from .dump import dump_dict, dump_samples
 from .read_hdf5 import get_ensemble
 from .utils import get_index_separation
@@ -51,6 +52,18 @@ def get_args():
         default="sym",
         help="Flow operator to use",
     )
+    parser.add_argument(
+        "--resampling",
+        choices=["bootstrap", "jackknife"],
+        default="bootstrap",
+        help=(
+            "Resampling scheme used to estimate uncertainties. "
+            "Jackknife samples cannot be combined with bootstrap samples, "
+            "so the same scheme must be used throughout the analysis; "
+            "quantities needing the plaquette, which is always bootstrapped, "
+            "such as decay constants, require bootstrap"
+        ),
+    )
     parser.add_argument(
         "--output_file_mean",
         type=FileType("w"),
@@ -103,6 +116,42 @@ def fit_w0_tau_exp(w0, flows, operator="sym"):
     return raw_tau_exp * get_index_separation(flows.trajectories)
 
 
+def w0_from_energy_density(times, energy_density, W0):
+    """
+    Find w0 from energy densities with flow time along the last axis,
+    as the square root of the flow time at which
+    W(t) = t d/dt (t^2 E(t)) first reaches W0,
+    interpolating linearly between flow times.
+    Leading axes (e.g. over samples) are handled at once;
+    where W(t) never reaches W0, NaN is returned.
+    """
+    t2E = times**2 * energy_density
+    W_times = times[1:-1]
+    W = W_times * (t2E[..., 2:] - t2E[..., :-2]) / (times[2:] - times[:-2])
+
+    crossed = W >= W0
+    index = np.maximum(crossed.argmax(axis=-1), 1)
+    W_below = np.take_along_axis(W, index[..., np.newaxis] - 1, axis=-1)[..., 0]
+    W_above = np.take_along_axis(W, index[..., np.newaxis], axis=-1)[..., 0]
+    t_below, t_above = W_times[index - 1], W_times[index]
+
+    t_w0 = t_below + (W0 - W_below) * (t_above - t_below) / (W_above - W_below)
+    return np.where(crossed.any(axis=-1), np.sqrt(t_w0), np.nan)
+
+
+def jackknife_ensemble_w0(flows, W0, operator="sym"):
+    """
+    Jackknife w0 over configurations,
+    computing it from the leave-one-out mean energy density of each sample.
+    """
+    energy_density = {"sym": flows.Ecs, "plaq": flows.Eps}[operator]
+    energy_density_samples = sample_jackknife(energy_density)
+    return JackknifeSampleSet(
+        w0_from_energy_density(flows.times, energy_density_samples.mean, W0),
+        w0_from_energy_density(flows.times, energy_density_samples.samples, W0),
+    )
+
+
 def read_flows(args):
     if args.filetype != "hdf5":
         return readers[args.filetype](args.flow_filename)
@@ -129,12 +178,20 @@ def main():
             max_trajectory=args.max_trajectory,
             trajectory_step=args.trajectory_step,
         )
-        w0_samples = bootstrap_ensemble_w0(
-            thinned_flows,
-            args.W0,
-            operator=args.operator,
-        )
-        w0_mean = bootstrap_finalize(w0_samples)
+        if args.resampling == "jackknife":
+            w0_samples = jackknife_ensemble_w0(
+                thinned_flows,
+                args.W0,
+                operator=args.operator,
+            )
+            w0_mean = w0_samples.to_ufloat()
+        else:
+            w0_samples = bootstrap_ensemble_w0(
+                thinned_flows,
+                args.W0,
+                operator=args.operator,
+            )
+            w0_mean = bootstrap_finalize(w0_samples)
         tau_exp_w0 = fit_w0_tau_exp(
             w0_mean.nominal_value,
             flows,
@@ -153,7 +210,12 @@ def main():
         },
         args.output_file_mean,
     )
-    if args.output_file_samples:
+    if args.output_file_samples and isinstance(w0_samples, JackknifeSampleSet):
+        dump_samples(
+            {"ensemble_name": args.ensemble_name, "w0": w0_samples},
+            args.output_file_samples,
+        )
+    elif args.output_file_samples:
         dump_samples(
             {
                 "ensemble_name": args.ensemble_name,
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+
+COMPRESSION_CHOICES = ["none", "gzip", "lzf"]
+
+# Compression levels above this give little further reduction on
+# byte-shuffled floating point data, at a large cost in write time
+GZIP_LEVEL = 4
+
+# Within the 10 KiB to 1 MiB range recommended for HDF5,
+# and small enough that a chunk fits in h5py's default 1 MiB chunk cache
+CHUNK_BYTES = 256 * 1024
+
+# Datasets smaller than this are left contiguous,
+# as chunk indexing would cost more than compression saves
+MIN_CHUNKED_BYTES = 4 * 1024
+
+
+def chunk_shape(shape, itemsize, configuration_axis=-1, chunk_bytes=CHUNK_BYTES):
+    """
+    Chunk shape for a dataset of the given shape,
+    spanning all other axes in full
+    (so that a chunk holds every time slice of a block of configurations)
+    and as many configurations along configuration_axis
+    as fit in chunk_bytes.
+    """
+    configuration_axis = configuration_axis % len(shape)
+    configuration_bytes = itemsize * int(
+        np.prod(
+            [extent for axis, extent in enumerate(shape) if axis != configuration_axis]
+        )
+    )
+    block = min(max(chunk_bytes // configuration_bytes, 1), shape[configuration_axis])
+    return tuple(
+        block if axis == configuration_axis else extent
+        for axis, extent in enumerate(shape)
+    )
+
+
+def dataset_layout(data, compression="gzip", configuration_axis=-1):
+    """
+    Keyword arguments for create_dataset to store data in chunks
+    of whole blocks of configurations,
+    byte-shuffled and compressed with compression.
+    Returns no arguments (leaving the default contiguous layout)
+    for compression "none", for scalar or non-numeric data,
+    and for data too small to benefit.
+    """
+    data = np.asarray(data)
+    if (
+        compression in (None, "none")
+        or data.ndim == 0
+        or data.dtype.kind not in "biufc"
+        or data.nbytes < MIN_CHUNKED_BYTES
+    ):
+        return {}
+
+    return {
+        "chunks": chunk_shape(data.shape, data.dtype.itemsize, configuration_axis),
+        "shuffle": True,
+        "compression": compression,
+        "compression_opts": GZIP_LEVEL if compression == "gzip" else None,
+    }
+
+
+def create_dataset(group, name, data, compression="none", configuration_axis=-1):
+    """
+    Create the dataset name in group holding data,
+    with the layout given by dataset_layout.
+    """
+    return group.create_dataset(
+        name,
+        data=data,
+        **dataset_layout(
+            data, compression=compression, configuration_axis=configuration_axis
+        ),
+    )
@@ -3,8 +3,17 @@
 from argparse import ArgumentParser, FileType
 import numpy as np
 
-from .bootstrap import get_rng, sample_bootstrap_1d
-from .read_hdf5 import filter_configurations
+from .bootstrap import (
+    autocorrelation_block_length,
+    bootstrap_state_filename,
+    get_bootstrap_indices,
+    sample_bootstrap_blocked,
+    sample_bootstrap_incremental,
+    sample_bootstrap_indexed,
+    sample_bootstrap_streaming,
+    sample_jackknife,
+)
+from .read_hdf5 import filter_configurations, load_measurements
 
 
 def get_args():
@@ -68,6 +77,49 @@ def get_args():
         default=1,
         help="Interval of trajectories to consider",
     )
+    parser.add_argument(
+        "--resampling",
+        choices=["bootstrap", "jackknife", "poisson"],
+        default="bootstrap",
+        help=(
+            "Resampling scheme used to estimate uncertainties. "
+            "With jackknife, --block_length sets the number of consecutive "
+            "configurations left out of each sample (default: 1). "
+            "poisson streams configurations from the HDF5 file in chunks, "
+            "so that they need not all be held in memory. "
+            "Jackknife samples cannot be combined with bootstrap samples, "
+            "so the same scheme must be used throughout the analysis; "
+            "quantities needing the plaquette, such as decay constants, "
+            "require bootstrap or poisson, matching that used for the plaquette"
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Store the Poisson bootstrap state alongside the HDF5 file "
+            "so that later runs read only configurations added since "
+            "(requires --resampling poisson)"
+        ),
+    )
+    parser.add_argument(
+        "--block_bootstrap",
+        choices=["moving", "non-overlapping"],
+        default=None,
+        help=(
+            "Resample blocks of consecutive configurations, "
+            "rather than individual configurations"
+        ),
+    )
+    parser.add_argument(
+        "--block_length",
+        type=int,
+        default=None,
+        help=(
+            "Length of blocks for --block_bootstrap "
+            "(default: twice the integrated autocorrelation time of each correlator)"
+        ),
+    )
     parser.add_argument(
         "--output_file_mean",
         type=FileType("w"),
@@ -104,6 +156,50 @@ def get_args():
         default=None,
         help="number of source location used for smearing measurements",
     )
+    parser.add_argument(
+        "--fit_backend",
+        choices=["corrfitter", "batched"],
+        default="corrfitter",
+        help="Whether to fit bootstrap samples one at a time or all at once",
+    )
+    parser.add_argument(
+        "--scan_windows",
+        action="store_true",
+        help=(
+            "Fit every admissible plateau window, "
+            "and report the AIC-weighted model average"
+        ),
+    )
+    parser.add_argument(
+        "--min_window_length",
+        type=int,
+        default=3,
+        help="Fewest time slices in a plateau window when scanning",
+    )
+    parser.add_argument(
+        "--window_table_file",
+        type=FileType("w"),
+        default=None,
+        help="Where to output the per-window results when scanning",
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=None,
+        help=(
+            "Number of processes over which to spread bootstrap sample fits. "
+            "(Defaults to the FIT_NUM_WORKERS environment variable, or 1.)"
+        ),
+    )
+    parser.add_argument(
+        "--svdcut",
+        type=float,
+        default=1e-12,
+        help=(
+            "SVD cut applied to the correlation matrix when factorising "
+            "the covariance matrix of each fit"
+        ),
+    )
     return parser.parse_args()
 
 
@@ -115,20 +211,108 @@ def renormalisation_constant(ch):
     }.get(ch, ch)
 
 
-def get_correlator_samples(
+def get_correlator_samples_batch(
     ensemble,
-    measurement,
+    measurements,
     min_trajectory=None,
     max_trajectory=None,
     trajectory_step=1,
+    block_bootstrap=None,
+    block_length=None,
+    resampling="bootstrap",
+    incremental=False,
+    correlators=None,
 ):
+    """
+    Bootstrap each of the correlator measurements over the selected
+    configurations, returning a list of sample sets.
+    The measurements are read together with load_measurements,
+    unless correlators already holds them as read for this selection.
+    If block_bootstrap is "moving" or "non-overlapping",
+    blocks of consecutive configurations are resampled together,
+    with length block_length
+    (or from the integrated autocorrelation time, if not given),
+    so that all configurations can be used without thinning.
+    If resampling is "jackknife", a (blocked) jackknife is used instead;
+    if it is "poisson", a streaming Poisson bootstrap.
+    With incremental set (which requires resampling "poisson"),
+    the Poisson bootstrap state is stored between calls,
+    so that only configurations appended since the last call are read.
+    """
     filtered_indices = filter_configurations(
         ensemble, min_trajectory, max_trajectory, trajectory_step
     )
 
-    C = ensemble[measurement][:, filtered_indices]
+    if incremental:
+        if resampling != "poisson" or block_bootstrap is not None:
+            raise ValueError(
+                "Incremental updates are only possible with the Poisson bootstrap"
+            )
+        return [
+            sample_bootstrap_incremental(
+                ensemble[measurement],
+                ensemble.name,
+                bootstrap_state_filename(
+                    ensemble,
+                    measurement,
+                    min_trajectory,
+                    max_trajectory,
+                    trajectory_step,
+                ),
+                ensemble["configurations"][()],
+                filtered_indices,
+            )
+            for measurement in measurements
+        ]
+
+    if resampling == "poisson":
+        return [
+            sample_bootstrap_streaming(
+                ensemble[measurement], ensemble.name, filtered_indices
+            )
+            for measurement in measurements
+        ]
+
+    if correlators is None:
+        correlators = load_measurements(ensemble, measurements, filtered_indices)
+    if block_bootstrap is not None and block_length is None:
+        # A common block length keeps the measurements' replicas correlated
+        block_length = max(
+            autocorrelation_block_length(correlators[measurement].T)
+            for measurement in measurements
+        )
+
+    samples = []
+    for measurement in measurements:
+        C = correlators[measurement]
+
+        if resampling == "jackknife":
+            samples.append(sample_jackknife(C.T, block_length or 1))
+        elif block_bootstrap is not None:
+            samples.append(
+                sample_bootstrap_blocked(
+                    C.T,
+                    ensemble.name,
+                    block_length=block_length,
+                    moving=(block_bootstrap == "moving"),
+                )
+            )
+        else:
+            samples.append(
+                sample_bootstrap_indexed(
+                    C.T, get_bootstrap_indices(ensemble, filtered_indices)
+                )
+            )
+    return samples
+
 
-    return sample_bootstrap_1d(C.T, get_rng(ensemble.name))
+def get_correlator_samples(ensemble, measurement, *args, **kwargs):
+    """
+    Bootstrap the correlator measurement over the selected configurations,
+    as get_correlator_samples_batch.
+    """
+    (samples,) = get_correlator_samples_batch(ensemble, [measurement], *args, **kwargs)
+    return samples
 
 
 def get_channel_tags(ch):
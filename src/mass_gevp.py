@@ -6,10 +6,14 @@ import numpy as np
 from itertools import product
 
 
-from .bootstrap import BootstrapSampleSet, BOOTSTRAP_SAMPLE_COUNT, bootstrap_finalize
+from .bootstrap import BOOTSTRAP_SAMPLE_COUNT, bootstrap_finalize, sample_set_types
 from .dump import dump_dict, dump_samples
 from . import extract, fitting
-from .mass_smear import bin_multi_source
+from .mass_smear import (
+    bin_multi_source_batch,
+    load_source_correlators,
+    with_common_block_length,
+)
 from .read_hdf5 import get_ensemble
 
 
@@ -75,6 +79,49 @@ def get_args():
         default=1,
         help="Interval of trajectories to consider",
     )
+    parser.add_argument(
+        "--resampling",
+        choices=["bootstrap", "jackknife", "poisson"],
+        default="bootstrap",
+        help=(
+            "Resampling scheme used to estimate uncertainties. "
+            "With jackknife, --block_length sets the number of consecutive "
+            "configurations left out of each sample (default: 1). "
+            "poisson streams configurations from the HDF5 file in chunks, "
+            "so that they need not all be held in memory. "
+            "Jackknife samples cannot be combined with bootstrap samples, "
+            "so the same scheme must be used throughout the analysis; "
+            "quantities needing the plaquette, such as decay constants, "
+            "require bootstrap or poisson, matching that used for the plaquette"
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Store the Poisson bootstrap state alongside the HDF5 file "
+            "so that later runs read only configurations added since "
+            "(requires --resampling poisson)"
+        ),
+    )
+    parser.add_argument(
+        "--block_bootstrap",
+        choices=["moving", "non-overlapping"],
+        default=None,
+        help=(
+            "Resample blocks of consecutive configurations, "
+            "rather than individual configurations"
+        ),
+    )
+    parser.add_argument(
+        "--block_length",
+        type=int,
+        default=None,
+        help=(
+            "Length of blocks for --block_bootstrap "
+            "(default: twice the integrated autocorrelation time of each correlator)"
+        ),
+    )
     parser.add_argument(
         "--output_file_mean",
         type=FileType("w"),
@@ -111,6 +158,34 @@ def get_args():
         default=None,
         help="number of source location used for smearing measurements",
     )
+    parser.add_argument(
+        "--GEVP_reference_t",
+        type=int,
+        default=None,
+        help=(
+            "time slice at which to fix the ordering of GEVP states, "
+            "tracking them elsewhere by eigenvector overlap "
+            "(default: order by eigenvalue at each time slice)"
+        ),
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=None,
+        help=(
+            "Number of processes over which to spread bootstrap sample fits. "
+            "(Defaults to the FIT_NUM_WORKERS environment variable, or 1.)"
+        ),
+    )
+    parser.add_argument(
+        "--svdcut",
+        type=float,
+        default=1e-12,
+        help=(
+            "SVD cut applied to the correlation matrix when factorising "
+            "the covariance matrix of each fit"
+        ),
+    )
     return parser.parse_args()
 
 
@@ -126,15 +201,16 @@ def fold_correlators_cross(C):
     return C_fold
 
 
-def get_meson_Cmat_mix_N(ensemble, args, ch1, ch2):
+def get_meson_Cmat_mix_N(ensemble, args, ch1, ch2, source_correlators=None):
     mixing_channel = [ch1, ch2]
 
-    mat = np.zeros(shape=(BOOTSTRAP_SAMPLE_COUNT, args.Nt, 2, 2))
+    mat = None
     mat_mean = np.zeros(shape=(1, args.Nt, 2, 2))
 
     matrix_size_channel = range(2)
     matrix_size_smearing = range(1)
 
+    entries = []
     for a, b, i, j in product(
         matrix_size_channel,
         matrix_size_channel,
@@ -143,15 +219,25 @@ def get_meson_Cmat_mix_N(ensemble, args, ch1, ch2):
     ):
         if a == b:
             ch = mixing_channel[a]
-            corr_set = bin_multi_source(ensemble, ch, args)
-            mat[:, :, a + i, b + j] = fold_correlators(corr_set.samples)
-            mat_mean[:, :, a + i, b + j] = fold_correlators(corr_set.mean)
-
+            fold, sign = fold_correlators, 1
         else:
             ch = mixing_channel[a] + "_" + mixing_channel[b] + "_re"
-            corr_set = bin_multi_source(ensemble, ch, args)
-            mat[:, :, a + i, b + j] = -fold_correlators_cross(corr_set.samples)
-            mat_mean[:, :, a + i, b + j] = -fold_correlators_cross(corr_set.mean)
+            fold, sign = fold_correlators_cross, -1
+        entries.append((a + i, b + j, ch, fold, sign))
+
+    # Read all channels of the matrix in one pass over each source location
+    corr_sets = bin_multi_source_batch(
+        ensemble,
+        [ch for _, _, ch, _, _ in entries],
+        args,
+        source_correlators=source_correlators,
+    )
+    for (row, column, ch, fold, sign), corr_set in zip(entries, corr_sets):
+        if mat is None:
+            # Jackknife sample counts depend on the number of configurations
+            mat = np.zeros(shape=(len(corr_set.samples), args.Nt, 2, 2))
+        mat[:, :, row, column] = sign * fold(corr_set.samples)
+        mat_mean[:, :, row, column] = sign * fold(corr_set.mean)
 
     return mat_mean, mat
 
@@ -163,10 +249,25 @@ def get_Cmat_VTmix(ensemble, args):
         ["g3", "g0g3"],
     ]
 
+    # The matrices of all three polarisations are averaged,
+    # so must be resampled on the same blocks
+    source_correlators = load_source_correlators(
+        ensemble,
+        [
+            ch
+            for ch1, ch2 in target_channels
+            for ch in [ch1, ch2, f"{ch1}_{ch2}_re", f"{ch2}_{ch1}_re"]
+        ],
+        args,
+    )
+    args = with_common_block_length(args, source_correlators)
+
     bin_samples = []
     mean_bin = []
     for channels in target_channels:
-        mean, samples = get_meson_Cmat_mix_N(ensemble, args, channels[0], channels[1])
+        mean, samples = get_meson_Cmat_mix_N(
+            ensemble, args, channels[0], channels[1], source_correlators
+        )
 
         mean_bin.append(mean)
         bin_samples.append(samples)
@@ -176,10 +277,11 @@ def get_Cmat_VTmix(ensemble, args):
 
 def main():
     args = get_args()
+    set_type = sample_set_types[args.resampling]
     if args.plateau_start == 0 and args.plateau_end == 0:
         mass, matrix_element, chi2 = (
-            BootstrapSampleSet(np.nan, np.zeros(BOOTSTRAP_SAMPLE_COUNT) * np.nan),
-            BootstrapSampleSet(np.nan, np.zeros(BOOTSTRAP_SAMPLE_COUNT) * np.nan),
+            set_type(np.nan, np.zeros(BOOTSTRAP_SAMPLE_COUNT) * np.nan),
+            set_type(np.nan, np.zeros(BOOTSTRAP_SAMPLE_COUNT) * np.nan),
             0,
         )
 
@@ -198,11 +300,21 @@ def main():
         Cmat_mean, Cmat = get_Cmat_VTmix(ensemble, args)
 
         eigenvalues = extract.GEVP_fixT(
-            Cmat_mean, Cmat, args.GEVP_t0, args.GEVP_t0 + 1, args.Nt
+            Cmat_mean,
+            Cmat,
+            args.GEVP_t0,
+            args.GEVP_t0 + 1,
+            args.Nt,
+            reference_t=args.GEVP_reference_t,
+            set_type=set_type,
         )
 
         mass, matrix_element, chi2 = fitting.fit_exp_bootstrap(
-            eigenvalues[1], args.plateau_start, args.plateau_end
+            eigenvalues[1],
+            args.plateau_start,
+            args.plateau_end,
+            num_workers=args.num_workers,
+            svdcut=args.svdcut,
         )
 
     fitted_m = bootstrap_finalize(mass)
@@ -228,10 +340,8 @@ def main():
         dump_samples(
             {
                 **metadata,
-                "smear_rhoE1_mass_samples": mass.samples,
-                "smear_rhoE1_mass_value": mass.mean,
-                "smear_rhoE1_matrix_element_samples": matrix_element.samples,
-                "smear_rhoE1_matrix_element_value": matrix_element.mean,
+                "smear_rhoE1_mass": mass,
+                "smear_rhoE1_matrix_element": matrix_element,
             },
             args.output_file_samples,
         )
@@ -1,41 +1,118 @@
 #!/usr/bin/env python3
 
+from argparse import Namespace
 
 import h5py
 import numpy as np
 
 
-from .bootstrap import BootstrapSampleSet, bootstrap_finalize
-from .dump import dump_dict, dump_samples
+from .bootstrap import autocorrelation_block_length, bootstrap_finalize
+from .dump import dump_dict, dump_samples, dump_table
 from . import extract
 from .mass import (
-    get_correlator_samples,
+    get_correlator_samples_batch,
     get_channel_tags,
     fold_correlators,
     get_args,
 )
-from .read_hdf5 import get_ensemble
+from .read_hdf5 import filter_configurations, get_ensemble, load_measurements
 
 
-def bin_multi_source(ensemble, ch, args):
-    bin_samples = []
-    bin_mean = []
-    for source_location in ensemble:
-        tmp_set = get_correlator_samples(
+def smeared_measurements(channels, args):
+    return [f"source_N100_sink_N{args.N_sink}/TRIPLET {ch}" for ch in channels]
+
+
+def load_source_correlators(ensemble, channels, args):
+    """
+    The correlators of channels at each source location of ensemble,
+    read once with load_measurements,
+    or None if the Poisson bootstrap will stream them from the file instead.
+    """
+    if args.resampling == "poisson" or args.incremental:
+        return None
+    return [
+        load_measurements(
             source_location,
-            f"source_N100_sink_N{args.N_sink}/TRIPLET {ch}",
+            smeared_measurements(channels, args),
+            filter_configurations(
+                source_location,
+                args.min_trajectory,
+                args.max_trajectory,
+                args.trajectory_step,
+            ),
+        )
+        for source_location in ensemble
+    ]
+
+
+def with_common_block_length(args, source_correlators):
+    """
+    Copy of args with block_length set, if the blocked bootstrap is in use
+    and no length was given, to the largest autocorrelation_block_length
+    of any of source_correlators (from load_source_correlators),
+    so that correlators that are later combined keep correlated replicas.
+    """
+    if (
+        args.block_bootstrap is None
+        or args.block_length is not None
+        or source_correlators is None
+    ):
+        return args
+    return Namespace(
+        **{
+            **vars(args),
+            "block_length": max(
+                autocorrelation_block_length(C.T)
+                for correlators in source_correlators
+                for C in correlators.values()
+            ),
+        }
+    )
+
+
+def bin_multi_source_batch(ensemble, channels, args, source_correlators=None):
+    """
+    Average the sampled correlators of each of channels over source locations,
+    reading all channels for a source location together.
+    source_correlators may hold correlators already read
+    by load_source_correlators (for these channels or more),
+    in which case args should already have a common block length;
+    otherwise they are read here.
+    """
+    if source_correlators is None:
+        source_correlators = load_source_correlators(ensemble, channels, args)
+        args = with_common_block_length(args, source_correlators)
+    measurements = smeared_measurements(channels, args)
+
+    source_sets = [
+        get_correlator_samples_batch(
+            source_location,
+            measurements,
             args.min_trajectory,
             args.max_trajectory,
             args.trajectory_step,
+            block_bootstrap=args.block_bootstrap,
+            block_length=args.block_length,
+            resampling=args.resampling,
+            incremental=args.incremental,
+            correlators=(
+                None if source_correlators is None else source_correlators[index]
+            ),
         )
-
-        bin_samples.append(tmp_set.samples)
-        bin_mean.append(tmp_set.mean)
-
-    mean = np.zeros(shape=(1, args.Nt))
-    mean[0] = np.array(bin_mean).mean(axis=0)
-
-    return BootstrapSampleSet(mean, np.array(bin_samples).mean(axis=0))
+        for index, source_location in enumerate(ensemble)
+    ]
+
+    binned_sets = []
+    for channel_sets in zip(*source_sets):
+        mean = np.zeros(shape=(1, args.Nt))
+        mean[0] = np.array([tmp_set.mean for tmp_set in channel_sets]).mean(axis=0)
+        binned_sets.append(
+            type(channel_sets[0])(
+                mean,
+                np.array([tmp_set.samples for tmp_set in channel_sets]).mean(axis=0),
+            )
+        )
+    return binned_sets
 
 
 def ch_extraction(ensemble, args):
@@ -43,17 +120,29 @@ def ch_extraction(ensemble, args):
 
     bin_samples = []
     bin_mean = []
-    for j in range(len(target_channels)):
-        tmp_set = bin_multi_source(ensemble, target_channels[j], args)
+    for tmp_set in bin_multi_source_batch(ensemble, target_channels, args):
         bin_samples.append(fold_correlators(tmp_set.samples) * args.Ns**3)
         bin_mean.append(fold_correlators(tmp_set.mean) * args.Ns**3)
 
-    corr = BootstrapSampleSet(
+    corr = type(tmp_set)(
         np.array(bin_mean).mean(axis=0), np.array(bin_samples).mean(axis=0)
     )
 
+    if args.scan_windows:
+        mass, matrix_element, chi2, window_results = extract.scan_meson_mass(
+            corr, args.min_window_length, svdcut=args.svdcut
+        )
+        if args.window_table_file:
+            dump_table(window_results, args.window_table_file)
+        return mass, matrix_element, chi2
+
     mass, matrix_element, chi2 = extract.extract_meson_mass(
-        corr, args.plateau_start, args.plateau_end
+        corr,
+        args.plateau_start,
+        args.plateau_end,
+        fit_backend=args.fit_backend,
+        num_workers=args.num_workers,
+        svdcut=args.svdcut,
     )
 
     return mass, matrix_element, chi2
@@ -98,10 +187,8 @@ def main():
         dump_samples(
             {
                 **metadata,
-                f"smear_{args.channel}_mass_samples": mass.samples,
-                f"smear_{args.channel}_mass_value": mass.mean,
-                f"smear_{args.channel}_matrix_element_samples": matrix_element.samples,
-                f"smear_{args.channel}_matrix_element_value": matrix_element.mean,
+                f"smear_{args.channel}_mass": mass,
+                f"smear_{args.channel}_matrix_element": matrix_element,
             },
             args.output_file_samples,
         )
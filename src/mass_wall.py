@@ -5,11 +5,11 @@ import h5py
 import numpy as np
 
 
-from .bootstrap import BootstrapSampleSet, bootstrap_finalize
-from .dump import dump_dict, dump_samples
+from .bootstrap import bootstrap_finalize
+from .dump import dump_dict, dump_samples, dump_table
 from . import extract
 from .mass import (
-    get_correlator_samples,
+    get_correlator_samples_batch,
     get_channel_tags,
     fold_correlators,
     get_args,
@@ -24,32 +24,42 @@ def ps_extraction(ensemble, args):
         corr_ab refers to <A><B> exp(-mt)
     and returns the mass and the matrix element B for calculating decay constants
     """
-    corr_aa = get_correlator_samples(
+    corr_aa, corr_ab = get_correlator_samples_batch(
         ensemble,
-        "TRIPLET/g5",
+        ["TRIPLET/g5", "TRIPLET/g5_g0g5_re"],
         args.min_trajectory,
         args.max_trajectory,
         args.trajectory_step,
+        block_bootstrap=args.block_bootstrap,
+        block_length=args.block_length,
+        resampling=args.resampling,
+        incremental=args.incremental,
     )
 
     aa_mean = np.zeros(shape=(1, args.Nt))
     aa_mean[0] = corr_aa.mean * args.Ns**3
-    C_aa = BootstrapSampleSet(aa_mean, corr_aa.samples * args.Ns**3)
-
-    corr_ab = get_correlator_samples(
-        ensemble,
-        "TRIPLET/g5_g0g5_re",
-        args.min_trajectory,
-        args.max_trajectory,
-        args.trajectory_step,
-    )
+    C_aa = type(corr_aa)(aa_mean, corr_aa.samples * args.Ns**3)
 
     ab_mean = np.zeros(shape=(1, args.Nt))
     ab_mean[0] = corr_ab.mean * args.Ns**3
-    C_ab = BootstrapSampleSet(ab_mean, corr_ab.samples * args.Ns**3)
+    C_ab = type(corr_ab)(ab_mean, corr_ab.samples * args.Ns**3)
+
+    if args.scan_windows:
+        mass, matrix_element, chi2, window_results = extract.scan_decay_constant(
+            C_aa, C_ab, args.min_window_length, svdcut=args.svdcut
+        )
+        if args.window_table_file:
+            dump_table(window_results, args.window_table_file)
+        return mass, matrix_element, chi2
 
     mass, matrix_element, chi2 = extract.meson_decay_constant(
-        C_aa, C_ab, args.plateau_start, args.plateau_end
+        C_aa,
+        C_ab,
+        args.plateau_start,
+        args.plateau_end,
+        fit_backend=args.fit_backend,
+        num_workers=args.num_workers,
+        svdcut=args.svdcut,
     )
     return mass, matrix_element, chi2
 
@@ -59,15 +69,17 @@ def ch_extraction(ensemble, args):
 
     bin_samples = []
     bin_mean = []
-    for j in range(len(target_channels)):
-        tmp_set = get_correlator_samples(
-            ensemble,
-            f"TRIPLET/{target_channels[j]}",
-            args.min_trajectory,
-            args.max_trajectory,
-            args.trajectory_step,
-        )
-
+    for tmp_set in get_correlator_samples_batch(
+        ensemble,
+        [f"TRIPLET/{channel}" for channel in target_channels],
+        args.min_trajectory,
+        args.max_trajectory,
+        args.trajectory_step,
+        block_bootstrap=args.block_bootstrap,
+        block_length=args.block_length,
+        resampling=args.resampling,
+        incremental=args.incremental,
+    ):
         bin_samples.append(tmp_set.samples * args.Ns**3)
         bin_mean.append(tmp_set.mean * args.Ns**3)
 
@@ -76,10 +88,23 @@ def ch_extraction(ensemble, args):
     mean = fold_correlators(mean)
     samples = fold_correlators(np.array(bin_samples).mean(axis=0))
 
-    corr = BootstrapSampleSet(mean, samples)
+    corr = type(tmp_set)(mean, samples)
+
+    if args.scan_windows:
+        mass, matrix_element, chi2, window_results = extract.scan_meson_mass(
+            corr, args.min_window_length, svdcut=args.svdcut
+        )
+        if args.window_table_file:
+            dump_table(window_results, args.window_table_file)
+        return mass, matrix_element, chi2
 
     mass, matrix_element, chi2 = extract.extract_meson_mass(
-        corr, args.plateau_start, args.plateau_end
+        corr,
+        args.plateau_start,
+        args.plateau_end,
+        fit_backend=args.fit_backend,
+        num_workers=args.num_workers,
+        svdcut=args.svdcut,
     )
 
     return mass, matrix_element, chi2
@@ -122,10 +147,8 @@ def main():
         dump_samples(
             {
                 **metadata,
-                f"{args.channel}_mass_samples": mass.samples,
-                f"{args.channel}_mass_value": mass.mean,
-                f"{args.channel}_matrix_element_samples": matrix_element.samples,
-                f"{args.channel}_matrix_element_value": matrix_element.mean,
+                f"{args.channel}_mass": mass,
+                f"{args.channel}_matrix_element": matrix_element,
             },
             args.output_file_samples,
         )
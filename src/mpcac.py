@@ -6,9 +6,14 @@ import h5py
 import matplotlib.pyplot as plt
 import numpy as np
 
-from .bootstrap import get_rng, sample_bootstrap_1d, bootstrap_finalize
+from .bootstrap import (
+    get_bootstrap_indices,
+    sample_bootstrap_indexed,
+    sample_jackknife,
+    bootstrap_finalize,
+)
 from .dump import dump_dict, dump_samples
-from .read_hdf5 import get_ensemble, filter_configurations
+from .read_hdf5 import get_ensemble, filter_configurations, load_measurements
 
 
 def get_args():
@@ -73,6 +78,18 @@ def get_args():
         default=1,
         help="Interval of trajectories to consider",
     )
+    parser.add_argument(
+        "--resampling",
+        choices=["bootstrap", "jackknife"],
+        default="bootstrap",
+        help=(
+            "Resampling scheme used to estimate uncertainties. "
+            "Jackknife samples cannot be combined with bootstrap samples, "
+            "so the same scheme must be used throughout the analysis; "
+            "quantities needing the plaquette, which is always bootstrapped, "
+            "such as decay constants, require bootstrap"
+        ),
+    )
     parser.add_argument(
         "--output_file_mean",
         type=FileType("w"),
@@ -107,17 +124,29 @@ def get_g5_eff_mass(sampled_correlator):
 
 
 def get_eff_mass_samples(
-    ensemble, min_trajectory=None, max_trajectory=None, trajectory_step=1
+    ensemble,
+    min_trajectory=None,
+    max_trajectory=None,
+    trajectory_step=1,
+    resampling="bootstrap",
 ):
     filtered_indices = filter_configurations(
         ensemble, min_trajectory, max_trajectory, trajectory_step
     )
 
-    g5 = ensemble["TRIPLET"]["g5"][:, filtered_indices]
-    g5_g0g5_re = ensemble["TRIPLET"]["g5_g0g5_re"][:, filtered_indices]
+    correlators = load_measurements(
+        ensemble, ["TRIPLET/g5", "TRIPLET/g5_g0g5_re"], filtered_indices
+    )
+    g5 = correlators["TRIPLET/g5"]
+    g5_g0g5_re = correlators["TRIPLET/g5_g0g5_re"]
 
-    g5_samples = sample_bootstrap_1d(g5.T, get_rng(ensemble.name))
-    g5_g0g5_re_samples = sample_bootstrap_1d(g5_g0g5_re.T, get_rng(ensemble.name))
+    if resampling == "jackknife":
+        g5_samples = sample_jackknife(g5.T)
+        g5_g0g5_re_samples = sample_jackknife(g5_g0g5_re.T)
+    else:
+        indices = get_bootstrap_indices(ensemble, filtered_indices)
+        g5_samples = sample_bootstrap_indexed(g5.T, indices)
+        g5_g0g5_re_samples = sample_bootstrap_indexed(g5_g0g5_re.T, indices)
 
     g5_eff_mass = get_g5_eff_mass(g5_samples)[0]
 
@@ -180,7 +209,11 @@ def main():
         data, beta=args.beta, mAS=args.mAS, Nt=args.Nt, Ns=args.Ns
     )
     eff_mass_samples = get_eff_mass_samples(
-        ensemble, args.min_trajectory, args.max_trajectory, args.trajectory_step
+        ensemble,
+        args.min_trajectory,
+        args.max_trajectory,
+        args.trajectory_step,
+        resampling=args.resampling,
     )
     fitted_mass_samples = eff_mass_samples[
         args.plateau_start : args.plateau_end
@@ -7,6 +7,7 @@ from flow_analysis.readers import read_flows_hirep
 import h5py
 import numpy as np
 
+from .hdf5_layout import COMPRESSION_CHOICES, create_dataset
 from .provenance import add_provenance_hdf5
 
 
@@ -29,6 +30,16 @@ def get_args():
         required=True,
         help="Where to place the combined HDF5 file.",
     )
+    parser.add_argument(
+        "--compression",
+        choices=COMPRESSION_CHOICES,
+        default="none",
+        help=(
+            "Store per-configuration data in byte-shuffled, compressed chunks "
+            "of whole blocks of configurations, using this filter. "
+            "(Defaults to uncompressed contiguous storage.)"
+        ),
+    )
     return parser.parse_args()
 
 
@@ -74,7 +85,7 @@ def get_filename_metadata(metadata, content):
             metadata[key] = value
 
 
-def process_file(flow_filename, h5file):
+def process_file(flow_filename, h5file, compression="none"):
     flows = read_flows_hirep(flow_filename, metadata_callback=get_filename_metadata)
     group_name = "gflow_{NT}x{NX}x{NY}x{NZ}b{beta}m{mAS}".format(**flows.metadata)
     group = h5file.create_group(group_name)
@@ -87,21 +98,27 @@ def process_file(flow_filename, h5file):
         "lattice",
         data=np.asarray([flows.metadata[key] for key in ["NT", "NX", "NY", "NZ"]]),
     )
-    group.create_dataset("plaquette", data=flows.plaquettes)
+    # Flow data have configurations along their first axis
+    create_dataset(
+        group, "plaquette", flows.plaquettes, compression, configuration_axis=0
+    )
     group.create_dataset("quarkmasses", data=[flows.metadata["mAS"]])
     group.create_dataset("flow type", data=flows.metadata.get("flow_type"))
 
     group.create_dataset("flow times", data=flows.times)
-    group.create_dataset("topological charge", data=flows.Qs)
-    group.create_dataset("energy density plaq", data=flows.Eps)
-    group.create_dataset("energy density sym", data=flows.Ecs)
+    for name, data in [
+        ("topological charge", flows.Qs),
+        ("energy density plaq", flows.Eps),
+        ("energy density sym", flows.Ecs),
+    ]:
+        create_dataset(group, name, data, compression, configuration_axis=0)
 
 
 def main():
     args = get_args()
     with h5py.File(args.h5_filename, "w-") as h5file:
         for flow_filename in args.flow_filenames:
-            process_file(flow_filename, h5file)
+            process_file(flow_filename, h5file, args.compression)
         add_provenance_hdf5(h5file)
 
 
@@ -7,6 +7,7 @@ from os.path import basename
 import h5py
 import numpy as np
 
+from .hdf5_layout import COMPRESSION_CHOICES, create_dataset
 from .provenance import add_provenance_hdf5
 
 
@@ -28,6 +29,16 @@ def get_args():
         required=True,
         help="Where to place the output HDF5 file.",
     )
+    parser.add_argument(
+        "--compression",
+        choices=COMPRESSION_CHOICES,
+        default="none",
+        help=(
+            "Store per-trajectory data in byte-shuffled, compressed chunks "
+            "of whole blocks of trajectories, using this filter. "
+            "(Defaults to uncompressed contiguous storage.)"
+        ),
+    )
     return parser.parse_args()
 
 
@@ -230,14 +241,22 @@ def get_correct_type(data):
     return result
 
 
-def write_hdf5(data, filename):
+def write_hdf5(data, filename, compression="none"):
     with h5py.File(filename, "w") as h5file:
         for datum in data:
             group = h5file.create_group(f"hmc_{name_ensemble(datum)}")
             for key, value in datum.items():
                 if isinstance(value, list) and not isinstance(value[0], int):
                     value = np.asarray(value, dtype=get_correct_type(value))
-                group.create_dataset(key, data=value)
+                # Trajectories are along the first axis
+                create_dataset(group, key, value, compression, configuration_axis=0)
+            create_dataset(
+                group,
+                "trajectory indices",
+                np.asarray(datum["trajectory"], dtype=int),
+                compression,
+                configuration_axis=0,
+            )
 
         add_provenance_hdf5(h5file)
 
@@ -245,7 +264,7 @@ def write_hdf5(data, filename):
 def main():
     args = get_args()
     data = [read_hmc(filename) for filename in args.hmc_filenames]
-    write_hdf5(data, args.h5_filename)
+    write_hdf5(data, args.h5_filename, args.compression)
 
 
 if __name__ == "__main__":
@@ -6,11 +6,18 @@ from flow_analysis.stats.autocorrelation import exp_autocorrelation_fit
 
 import h5py
 import logging
-import re
-
-from .bootstrap import sample_bootstrap_0d, bootstrap_finalize, get_rng
+import numpy as np
+
+from .bootstrap import (
+    bootstrap_finalize,
+    bootstrap_state_filename,
+    get_bootstrap_indices,
+    sample_bootstrap_incremental,
+    sample_bootstrap_indexed,
+    sample_bootstrap_streaming,
+)
 from .dump import dump_dict, dump_samples
-from .read_hdf5 import get_ensemble
+from .read_hdf5 import get_ensemble, get_trajectory_indices
 from .utils import get_index_separation
 
 
@@ -70,6 +77,25 @@ def get_args():
         default=1,
         help="Interval of trajectories to consider",
     )
+    parser.add_argument(
+        "--resampling",
+        choices=["bootstrap", "poisson"],
+        default="bootstrap",
+        help=(
+            "Resampling scheme used to estimate uncertainties; "
+            "must match that used for quantities combined with the plaquette. "
+            "poisson streams configurations from the HDF5 file in chunks"
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Store the Poisson bootstrap state alongside the HDF5 file "
+            "so that later runs read only configurations added since "
+            "(requires --resampling poisson)"
+        ),
+    )
     parser.add_argument(
         "--output_file_mean",
         type=FileType("w"),
@@ -98,18 +124,15 @@ def get_mass(ensemble):
     return ensemble["quarkmasses"][0]
 
 
-def get_cfg_indices(cfgs, start_cfg=0, end_cfg=None, cfg_step=1):
-    trajectory_indices = []
-    array_indices = []
-    for array_index, filename in enumerate(cfgs):
-        trajectory_index = int(re.match(".*n([0-9]+)$", filename.decode()).groups()[0])
-        if trajectory_index < start_cfg:
-            continue
-        if end_cfg is not None and trajectory_index > end_cfg:
-            continue
-        if (trajectory_index - start_cfg) % cfg_step == 0:
-            trajectory_indices.append(trajectory_index)
-            array_indices.append(array_index)
+def get_cfg_indices(ensemble, start_cfg=0, end_cfg=None, cfg_step=1):
+    indices = get_trajectory_indices(ensemble)
+    selected = (
+        (indices >= start_cfg)
+        & ((indices <= end_cfg) if end_cfg is not None else True)
+        & ((indices - start_cfg) % cfg_step == 0)
+    )
+    trajectory_indices = indices[selected].tolist()
+    array_indices = np.flatnonzero(selected).tolist()
 
     separation = get_index_separation(trajectory_indices)
     if separation != cfg_step and cfg_step > 1:
@@ -119,24 +142,52 @@ def get_cfg_indices(cfgs, start_cfg=0, end_cfg=None, cfg_step=1):
     return trajectory_indices, array_indices
 
 
-def avg_plaquette(ensemble, start_cfg, end_cfg, cfg_step, name="..."):
+def avg_plaquette(
+    ensemble,
+    start_cfg,
+    end_cfg,
+    cfg_step,
+    name="...",
+    resampling="bootstrap",
+    incremental=False,
+):
+    if incremental and resampling != "poisson":
+        raise ValueError(
+            "Incremental updates are only possible with the Poisson bootstrap"
+        )
+
     result = {}
     result.update(get_volumes(ensemble))
     result["ensemble_name"] = name
     result["mAS"] = get_mass(ensemble)
     result["beta"] = ensemble["beta"][()]
     spectrum_trajectory_indices, _ = get_cfg_indices(
-        ensemble["configurations"], start_cfg, end_cfg, cfg_step
+        ensemble, start_cfg, end_cfg, cfg_step
     )
     result["Ncfg_spectrum"] = len(spectrum_trajectory_indices)
     result["delta_traj_spectrum"] = get_index_separation(spectrum_trajectory_indices)
 
     plaquette_trajectory_indices, plaquette_array_indices = get_cfg_indices(
-        ensemble["configurations"], start_cfg, end_cfg
+        ensemble, start_cfg, end_cfg
     )
     result["delta_traj_plaq"] = get_index_separation(plaquette_trajectory_indices)
     raw_plaquettes = ensemble["plaquette"][plaquette_array_indices]
-    result["plaquette"] = sample_bootstrap_0d(raw_plaquettes, get_rng(ensemble.name))
+    if incremental:
+        result["plaquette"] = sample_bootstrap_incremental(
+            ensemble["plaquette"],
+            ensemble.name,
+            bootstrap_state_filename(ensemble, "plaquette", start_cfg, end_cfg),
+            ensemble["configurations"][()],
+            plaquette_array_indices,
+        )
+    elif resampling == "poisson":
+        result["plaquette"] = sample_bootstrap_streaming(
+            ensemble["plaquette"], ensemble.name, plaquette_array_indices
+        )
+    else:
+        result["plaquette"] = sample_bootstrap_indexed(
+            raw_plaquettes, get_bootstrap_indices(ensemble, plaquette_array_indices)
+        )
 
     result["avg_plaquette"] = bootstrap_finalize(result["plaquette"])
     result["tau_exp_plaq"] = (
@@ -157,6 +208,8 @@ def main():
         args.max_trajectory,
         args.trajectory_step,
         args.ensemble_name,
+        resampling=args.resampling,
+        incremental=args.incremental,
     )
     metadata_fields = [
         "Nt",
@@ -57,9 +57,10 @@ def plot(data, fit_results, **kwargs):
             if "ps_mass_samples" not in datum:
                 continue
 
-            Y = (datum["ps_mass_samples"]) ** 2 / datum["mPCAC_samples"]
+            # Evaluated lazily in a single pass when the mean is first needed
+            Y = datum["ps_mass_samples"].lazy() ** 2 / datum["mPCAC_samples"]
 
-            X = (datum["ps_decay_constant_samples"]) ** 2
+            X = datum["ps_decay_constant_samples"].lazy() ** 2
 
             X = np.log(X)
             Y = np.log(Y)
@@ -2,23 +2,16 @@
 
 
 import h5py
-import numpy as np
-import re
 
 from .dump import dump_dict
 from flow_analysis.stats.autocorrelation import exp_autocorrelation_fit
 from .mass import get_args
-from .read_hdf5 import get_ensemble
+from .read_hdf5 import get_ensemble, get_trajectory_indices
 from .utils import get_index_separation
 
 
 def ps_correlator_autocorrelation(ensemble, args):
-    indices = np.asarray(
-        [
-            int(re.match(".*n([0-9]+)$", filename.decode()).groups()[0])
-            for filename in ensemble["configurations"]
-        ]
-    )
+    indices = get_trajectory_indices(ensemble)
     filtered_indices = (
         (indices >= args.min_trajectory) if args.min_trajectory is not None else True
     ) & ((indices <= args.max_trajectory) if args.max_trajectory is not None else True)
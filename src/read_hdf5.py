@@ -1,47 +1,170 @@
 #!/usr/bin/env python3
-import numpy as np
+from collections import defaultdict
+import hashlib
+import json
+import logging
+import os
 import re
+import tempfile
+
+import h5py
+import numpy as np
+
+
+def ensemble_catalog_entry(ensemble):
+    """The fields of ensemble that get_ensemble may filter on."""
+    masses = ensemble.get("quarkmasses", [])
+    lattice = ensemble.get("lattice")
+    epsilon = ensemble.get("Wuppertal_eps_anti", [])
+    return {
+        "path": ensemble.name,
+        "beta": ensemble.get("beta", {(): None})[()],
+        "mAS": masses[0] if len(masses) == 1 else None,
+        "Nt": None if lattice is None else int(lattice[0]),
+        "Ns": (
+            int(lattice[-1])
+            if lattice is not None and len(set(lattice[-3:])) == 1
+            else None
+        ),
+        "epsilon": epsilon[0] if len(epsilon) else None,
+    }
+
+
+def catalog_filename(filename):
+    """
+    Sidecar file holding the ensemble catalog of the HDF5 file filename;
+    by default alongside it, or in ENSEMBLE_CATALOG_DIR
+    if that environment variable is set.
+    """
+    if "ENSEMBLE_CATALOG_DIR" not in os.environ:
+        return f"{filename}.ensemble_catalog.json"
+    path_hash = hashlib.sha256(os.path.abspath(filename).encode("utf8")).hexdigest()
+    return os.path.join(
+        os.environ["ENSEMBLE_CATALOG_DIR"],
+        f"{os.path.basename(filename)}.{path_hash[:16]}.ensemble_catalog.json",
+    )
+
+
+def file_signature(filename):
+    status = os.stat(filename)
+    return {"mtime_ns": status.st_mtime_ns, "size": status.st_size}
+
+
+def build_catalog(ensembles):
+    return [
+        ensemble_catalog_entry(ensemble)
+        for ensemble in ensembles.values()
+        if isinstance(ensemble, h5py.Group)
+    ]
+
+
+def get_catalog(ensembles):
+    """
+    Catalog of the fields of every top-level group in the HDF5 file ensembles,
+    read from a sidecar file if one exists that matches the file's
+    modification time and size,
+    and otherwise built by scanning the file and stored for next time.
+    """
+    filename = ensembles.file.filename
+    signature = file_signature(filename)
+    sidecar = catalog_filename(filename)
+    try:
+        with open(sidecar, "r") as f:
+            catalog = json.load(f)
+        if catalog["signature"] == signature:
+            return catalog["entries"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    entries = build_catalog(ensembles)
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(sidecar)), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=os.path.dirname(os.path.abspath(sidecar)), delete=False
+        ) as f:
+            json.dump({"signature": signature, "entries": entries}, f, default=float)
+        os.replace(f.name, sidecar)
+    except OSError:
+        logging.warning(f"Unable to store ensemble catalog in {sidecar}")
+    return entries
+
+
+CATALOG_FIELDS = ["beta", "mAS", "Nt", "Ns", "epsilon"]
+
+_catalog_indices = {}
+
+
+def get_catalog_index(ensembles):
+    """
+    Paths of the groups of the HDF5 file ensembles,
+    indexed by the tuple of their CATALOG_FIELDS (see get_catalog).
+    The index is built once per file and kept for later calls,
+    until the file's modification time or size changes.
+    """
+    filename = os.path.abspath(ensembles.file.filename)
+    signature = file_signature(filename)
+    key = (filename, signature["mtime_ns"], signature["size"])
+    if key not in _catalog_indices:
+        for stale_key in [other for other in _catalog_indices if other[0] == filename]:
+            del _catalog_indices[stale_key]
+        index = defaultdict(list)
+        for entry in get_catalog(ensembles):
+            index[tuple(entry[field] for field in CATALOG_FIELDS)].append(entry["path"])
+        _catalog_indices[key] = dict(index)
+    return _catalog_indices[key]
 
 
 def get_ensemble(
     ensembles, beta=None, mAS=None, Nt=None, Ns=None, num_source=1, epsilon=None
 ):
-    candidate_ensembles = []
-    for ensemble in ensembles.values():
-        if beta is not None and ensemble.get("beta", {(): None})[()] != beta:
-            continue
-        if mAS is not None and (
-            len(masses := ensemble.get("quarkmasses", [])) != 1 or masses[0] != mAS
-        ):
-            continue
-        if Nt is not None and ensemble.get("lattice", [None])[0] != Nt:
-            continue
-        if Ns is not None and tuple(ensemble.get("lattice", [None])[-3:]) != (
-            Ns,
-            Ns,
-            Ns,
-        ):
-            continue
-        if epsilon is not None and ensemble.get("Wuppertal_eps_anti", [])[0] != epsilon:
-            continue
-        candidate_ensembles.append(ensemble)
+    """
+    Find the num_source groups of the HDF5 file ensembles
+    matching all of the given parameters.
+    Groups are looked up in the file's ensemble catalog
+    (see get_catalog_index) rather than by reading each group in turn.
+    """
+    query = (beta, mAS, Nt, Ns, epsilon)
+    index = get_catalog_index(ensembles)
+
+    if None not in query:
+        paths = index.get(query, [])
+    else:
+        paths = [
+            path
+            for key, key_paths in index.items()
+            if all(
+                requested is None or requested == value
+                for requested, value in zip(query, key)
+            )
+            for path in key_paths
+        ]
+
+    candidate_ensembles = [ensembles[path] for path in paths]
     if len(candidate_ensembles) != num_source:
         raise ValueError("Did not uniquely identify one ensemble.")
-    elif len(candidate_ensembles) == 0:
-        raise ValueError("No ensembles found.")
-    else:
-        return candidate_ensembles
+    return candidate_ensembles
 
 
-def filter_configurations(
-    ensemble, min_trajectory=None, max_trajectory=None, trajectory_step=1
-):
-    indices = np.asarray(
+def get_trajectory_indices(ensemble):
+    """
+    Trajectory index of each configuration of ensemble,
+    from its "trajectory indices" dataset where packaging has provided one,
+    or otherwise parsed from the configuration filenames.
+    """
+    if "trajectory indices" in ensemble:
+        return ensemble["trajectory indices"][()]
+    return np.asarray(
         [
             int(re.match(".*n([0-9]+)$", filename.decode()).groups()[0])
             for filename in ensemble["configurations"]
         ]
     )
+
+
+def filter_configurations(
+    ensemble, min_trajectory=None, max_trajectory=None, trajectory_step=1
+):
+    indices = get_trajectory_indices(ensemble)
     filtered_indices = (
         ((indices >= min_trajectory) if min_trajectory is not None else True)
         & ((indices <= max_trajectory) if max_trajectory is not None else True)
@@ -49,3 +172,61 @@ def filter_configurations(
     )
 
     return filtered_indices
+
+
+# Selections picking out at least this fraction of the configurations
+# between their first and last are read as one span and masked in memory
+MIN_SPAN_DENSITY = 0.5
+
+
+def load_measurements(ensemble, measurements, selection=None):
+    """
+    Read the datasets measurements of ensemble,
+    which have configurations along their last axis,
+    returning a dict of arrays restricted to the configurations picked out by
+    selection (a boolean mask or array of indices; all if None).
+    Every dataset is read with a single read_direct
+    into a shared preallocated buffer, using the same selection.
+    If the selection is dense enough (see MIN_SPAN_DENSITY),
+    this is the span from the first to the last configuration selected,
+    which is then masked in memory for all datasets at once;
+    otherwise it is a strided hyperslab if the selected configurations
+    are regularly spaced, and a point selection if not.
+    """
+    datasets = [ensemble[measurement] for measurement in measurements]
+    shapes = {dataset.shape for dataset in datasets}
+    if len(shapes) != 1:
+        raise ValueError("Measurements to load together must have the same shape")
+    (shape,) = shapes
+
+    mask = np.zeros(shape[-1], dtype=bool)
+    mask[np.arange(shape[-1]) if selection is None else selection] = True
+    selected = np.flatnonzero(mask)
+    start, stop = (selected[0], selected[-1] + 1) if len(selected) else (0, 0)
+
+    steps = np.unique(np.diff(selected))
+    span_mask = None
+    if len(selected) >= MIN_SPAN_DENSITY * (stop - start):
+        source_sel = np.s_[..., start:stop]
+        span_mask = mask[start:stop]
+    elif len(steps) == 1:
+        source_sel = np.s_[..., start : stop : steps[0]]
+    else:
+        source_sel = np.s_[..., selected]
+
+    buffer = np.empty(
+        (
+            len(datasets),
+            *shape[:-1],
+            len(selected) if span_mask is None else stop - start,
+        ),
+        dtype=np.result_type(*[dataset.dtype for dataset in datasets]),
+    )
+    if len(selected):
+        for index, dataset in enumerate(datasets):
+            dataset.read_direct(buffer, source_sel=source_sel, dest_sel=np.s_[index])
+
+    if span_mask is None or span_mask.all():
+        # Contiguous selections need no copy
+        return dict(zip(measurements, buffer))
+    return dict(zip(measurements, buffer[..., span_mask]))
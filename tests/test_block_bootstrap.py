@@ -0,0 +1,42 @@
+import h5py
+import numpy as np
+
+from src.bootstrap import autocorrelation_block_length
+from src.mass import get_correlator_samples_batch
+
+
+def autoregressive_series(rng, length, coefficient):
+    series = np.empty(length)
+    series[0] = rng.standard_normal()
+    for index in range(1, length):
+        series[index] = coefficient * series[index - 1] + rng.standard_normal()
+    return series
+
+
+def test_blocked_bootstrap_keeps_channels_correlated():
+    rng = np.random.default_rng(1)
+    num_configurations = 1000
+    shared = rng.standard_normal(num_configurations)
+
+    # Both channels share one time slice exactly,
+    # but their other time slice has very different autocorrelation times
+    slow = np.stack([autoregressive_series(rng, num_configurations, 0.95), shared])
+    fast = np.stack([rng.standard_normal(num_configurations), shared])
+    assert autocorrelation_block_length(slow.T) != autocorrelation_block_length(fast.T)
+
+    with h5py.File("ensemble.h5", "w", driver="core", backing_store=False) as f:
+        ensemble = f.create_group("ensemble")
+        ensemble["configurations"] = [
+            f"run1_n{index}".encode() for index in range(num_configurations)
+        ]
+        ensemble["trajectory indices"] = np.arange(num_configurations)
+        ensemble["slow"] = slow
+        ensemble["fast"] = fast
+
+        for block_bootstrap in "moving", "non-overlapping":
+            slow_set, fast_set = get_correlator_samples_batch(
+                ensemble,
+                ["slow", "fast"],
+                block_bootstrap=block_bootstrap,
+            )
+            assert np.array_equal(slow_set.samples[:, 1], fast_set.samples[:, 1])
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+from argparse import ArgumentParser
+import os
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from src.read_hdf5 import filter_configurations, get_ensemble, load_measurements
+
+
+CHANNELS = ["g1", "g2", "g3", "g0g1", "g0g2", "g0g3", "g5", "g5_g0g5_re"]
+
+
+def get_args():
+    parser = ArgumentParser(
+        description=(
+            "Time reading the correlators an ensemble needs "
+            "one masked dataset at a time, as the analysis did previously, "
+            "against a single pass with load_measurements."
+        )
+    )
+    parser.add_argument(
+        "h5file",
+        nargs="?",
+        default=None,
+        help=(
+            "Correlator file to read. "
+            "(Defaults to a synthetic file written like the Julia packaging.)"
+        ),
+    )
+    parser.add_argument("--beta", type=float, default=None)
+    parser.add_argument("--mAS", type=float, default=None)
+    parser.add_argument("--Nt", type=int, default=48)
+    parser.add_argument("--Ns", type=int, default=None)
+    parser.add_argument(
+        "--num_configurations",
+        type=int,
+        default=2000,
+        help="Number of configurations in the synthetic file",
+    )
+    parser.add_argument(
+        "--trajectory_steps",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4],
+        help="Thinning intervals of the configuration selections to time",
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    return parser.parse_args()
+
+
+def write_synthetic_file(filename, lattice_t, num_configurations, seed=1):
+    rng = np.random.default_rng(seed)
+    with h5py.File(filename, "w") as f:
+        ensemble = f.create_group("synthetic")
+        ensemble["configurations"] = [
+            f"run1_{lattice_t}x24x24x24nc4b6.6m-1.0n{index}".encode()
+            for index in range(num_configurations)
+        ]
+        ensemble["trajectory indices"] = np.arange(num_configurations)
+        for channel in CHANNELS:
+            ensemble.create_dataset(
+                f"TRIPLET/{channel}",
+                data=rng.standard_normal((lattice_t, num_configurations)),
+                chunks=(min(20, lattice_t), min(10, num_configurations)),
+                compression="gzip",
+                compression_opts=9,
+            )
+    return h5py.File(filename, "r")["synthetic"]
+
+
+def read_masked(ensemble, measurements, selection):
+    return {
+        measurement: ensemble[measurement][:, selection] for measurement in measurements
+    }
+
+
+def time_reads(read, ensemble, measurements, selection, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = read(ensemble, measurements, selection)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    args = get_args()
+    with tempfile.TemporaryDirectory() as directory:
+        if args.h5file is None:
+            ensemble = write_synthetic_file(
+                os.path.join(directory, "correlators.h5"),
+                args.Nt,
+                args.num_configurations,
+            )
+        else:
+            (ensemble,) = get_ensemble(
+                h5py.File(args.h5file, "r"),
+                beta=args.beta,
+                mAS=args.mAS,
+                Nt=args.Nt,
+                Ns=args.Ns,
+            )
+        measurements = [
+            f"TRIPLET/{channel}"
+            for channel in CHANNELS
+            if f"TRIPLET/{channel}" in ensemble
+        ]
+
+        print(
+            f"{'step':>6} {'masked / s':>11} {'batched / s':>12} "
+            f"{'speedup':>8} {'identical':>10}"
+        )
+        for trajectory_step in args.trajectory_steps:
+            selection = filter_configurations(ensemble, trajectory_step=trajectory_step)
+            masked_time, masked_result = time_reads(
+                read_masked, ensemble, measurements, selection, args.repeats
+            )
+            batched_time, batched_result = time_reads(
+                load_measurements, ensemble, measurements, selection, args.repeats
+            )
+            identical = all(
+                np.array_equal(masked_result[measurement], batched_result[measurement])
+                for measurement in measurements
+            )
+            print(
+                f"{trajectory_step:>6} {masked_time:>11.4f} {batched_time:>12.4f} "
+                f"{masked_time / batched_time:>8.2f} {str(identical):>10}"
+            )
+        ensemble.file.close()
+
+
+if __name__ == "__main__":
+    main()
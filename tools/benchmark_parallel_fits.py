@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+from argparse import ArgumentParser
+from functools import partial
+import time
+
+import numpy as np
+
+from src.fitting import (
+    fit_correlator_sample,
+    make_models,
+    map_samples,
+    whitened_fit_data,
+)
+
+
+def get_args():
+    parser = ArgumentParser(
+        description=(
+            "Time per-sample cosh fits of a synthetic correlator "
+            "serially and in a process pool, for a range of sample counts."
+        )
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        nargs="+",
+        default=[2, 4, 8],
+        help="Worker counts to compare against the serial path",
+    )
+    parser.add_argument(
+        "--sample_counts",
+        type=int,
+        nargs="+",
+        default=[50, 100, 200, 400],
+        help="Numbers of bootstrap samples to fit",
+    )
+    parser.add_argument("--Nt", type=int, default=24, help="Temporal extent")
+    parser.add_argument("--plateau_start", type=int, default=5)
+    parser.add_argument("--plateau_end", type=int, default=11)
+    return parser.parse_args()
+
+
+def synthetic_samples(num_samples, lattice_t, mass=0.4, seed=1):
+    rng = np.random.default_rng(seed)
+    t = np.arange(lattice_t)
+    signal = 0.5 * (np.exp(-mass * t) + np.exp(-mass * (lattice_t - t)))
+    samples = signal * (1 + 0.02 * rng.standard_normal((num_samples, 1)))
+    samples += 1e-4 * signal[lattice_t // 2] * rng.standard_normal(samples.shape)
+    return (samples + np.roll(np.flip(samples, axis=1), 1, axis=1)) / 2
+
+
+def time_fits(fit_function, samples, num_workers):
+    start = time.perf_counter()
+    result = np.asarray(map_samples(fit_function, samples, num_workers=num_workers))
+    return time.perf_counter() - start, result
+
+
+def main():
+    args = get_args()
+    print(
+        f"{'samples':>8} {'workers':>8} {'time / s':>10} {'speedup':>8} {'identical':>10}"
+    )
+    for num_samples in args.sample_counts:
+        samples = synthetic_samples(num_samples, args.Nt)
+        projection, whitening = whitened_fit_data(
+            make_models(args.plateau_start, args.plateau_end, args.Nt),
+            dict(Gab=np.cov(samples.T)),
+        )
+        fit_function = partial(
+            fit_correlator_sample,
+            projection=projection,
+            whitening=whitening,
+            plateau_start=args.plateau_start,
+            plateau_end=args.plateau_end,
+            tp=args.Nt,
+            p0={"log(a)": np.log([0.7]), "log(dE)": np.log([0.4])},
+        )
+        serial_time, serial_result = time_fits(fit_function, samples, 1)
+        print(f"{num_samples:>8} {1:>8} {serial_time:>10.3f} {1:>8.2f} {'-':>10}")
+        for num_workers in args.num_workers:
+            parallel_time, parallel_result = time_fits(
+                fit_function, samples, num_workers
+            )
+            identical = np.array_equal(serial_result, parallel_result)
+            print(
+                f"{num_samples:>8} {num_workers:>8} {parallel_time:>10.3f} "
+                f"{serial_time / parallel_time:>8.2f} {str(identical):>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
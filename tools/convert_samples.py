@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+from argparse import ArgumentParser
+import os
+
+from src.bootstrap import BootstrapSampleSet
+from src.dump import dump_samples_hdf5, read_sample_file
+
+
+def get_args():
+    parser = ArgumentParser(
+        description=(
+            "Convert JSON sample files written by dump_samples "
+            "to the HDF5 sample format, alongside the originals."
+        )
+    )
+    parser.add_argument("filenames", nargs="+", help="JSON sample files to convert")
+    parser.add_argument(
+        "--remove",
+        action="store_true",
+        help="Delete each JSON file once it has been converted",
+    )
+    return parser.parse_args()
+
+
+def convert_sample_file(filename):
+    data = {
+        (
+            key.removesuffix("_samples")
+            if isinstance(value, BootstrapSampleSet)
+            else key
+        ): value
+        for key, value in read_sample_file(filename).items()
+    }
+    output_filename = f"{os.path.splitext(filename)[0]}.h5"
+    dump_samples_hdf5(data, output_filename)
+    return output_filename
+
+
+def main():
+    args = get_args()
+    for filename in args.filenames:
+        output_filename = convert_sample_file(filename)
+        print(
+            f"{filename} ({os.path.getsize(filename)} bytes) -> "
+            f"{output_filename} ({os.path.getsize(output_filename)} bytes)"
+        )
+        if args.remove:
+            os.remove(filename)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+from argparse import ArgumentParser, FileType
+import json
+
+from src.fitting import FitCache
+
+
+def get_args():
+    parser = ArgumentParser(
+        description="Report hit, miss, and eviction statistics for a fit cache."
+    )
+    parser.add_argument("cache_dir", help="Directory containing the fit cache")
+    parser.add_argument(
+        "--output_file",
+        type=FileType("w"),
+        default="-",
+        help="Where to output the statistics as JSON. (Defaults to stdout.)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    statistics = FitCache(args.cache_dir).statistics()
+    print(json.dumps(statistics, indent=4), file=args.output_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+from argparse import ArgumentParser
+import os
+import time
+
+import h5py
+import numpy as np
+
+from src.hdf5_layout import COMPRESSION_CHOICES, dataset_layout
+from src.read_hdf5 import load_measurements
+
+
+def get_args():
+    parser = ArgumentParser(
+        description=(
+            "Rewrite HDF5 files such as correlators_*.h5 with per-configuration data "
+            "in byte-shuffled, compressed chunks of whole blocks of configurations, "
+            "reporting the file sizes and read times before and after."
+        )
+    )
+    parser.add_argument("filenames", nargs="+", help="HDF5 files to repack")
+    parser.add_argument(
+        "--output_suffix",
+        default="_repacked",
+        help="Suffix added to the stem of each filename to name its repacked copy",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=COMPRESSION_CHOICES,
+        default="gzip",
+        help="Filter to compress chunks with",
+    )
+    parser.add_argument(
+        "--configuration_axis",
+        type=int,
+        default=-1,
+        help=(
+            "Axis of each dataset along which configurations are stored "
+            "(-1 for correlators, 0 for flow and HMC data)"
+        ),
+    )
+    parser.add_argument(
+        "--trajectory_step",
+        type=int,
+        default=1,
+        help="Interval of configurations read when timing reads",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    return parser.parse_args()
+
+
+def copy_attributes(source, destination):
+    for key, value in source.attrs.items():
+        destination.attrs[key] = value
+
+
+def repack_group(source, destination, compression, configuration_axis):
+    copy_attributes(source, destination)
+    for name, item in source.items():
+        if isinstance(item, h5py.Group):
+            repack_group(
+                item, destination.create_group(name), compression, configuration_axis
+            )
+            continue
+
+        data = item[()]
+        layout = dataset_layout(data, compression, configuration_axis)
+        if not layout:
+            # Keep strings, scalars and small datasets exactly as they were
+            source.copy(item, destination, name=name)
+            continue
+        copy_attributes(
+            item,
+            destination.create_dataset(name, data=data, dtype=item.dtype, **layout),
+        )
+
+
+def repack_file(filename, output_filename, compression, configuration_axis):
+    with (
+        h5py.File(filename, "r") as source,
+        h5py.File(output_filename, "w", libver="latest") as destination,
+    ):
+        repack_group(source, destination, compression, configuration_axis)
+
+
+def is_measurement(dataset):
+    return dataset.ndim >= 1 and dataset.dtype.kind in "biufc"
+
+
+def get_measurement_batches(h5file, configuration_axis):
+    """
+    Group the per-configuration datasets of h5file by parent group and shape,
+    as they would be read together by load_measurements.
+    """
+    batches = {}
+
+    def visit(name, item):
+        if isinstance(item, h5py.Dataset) and is_measurement(item):
+            parent, _, measurement = name.rpartition("/")
+            batches.setdefault((parent, item.shape), []).append(measurement)
+
+    h5file.visititems(visit)
+    return batches
+
+
+def drop_cached_pages(filename):
+    """
+    Ask the kernel to drop filename from the page cache,
+    so that reads are timed from the filesystem.
+    Returns False if this is not supported.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    with open(filename, "rb") as f:
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+    return True
+
+
+def time_cold_reads(filename, configuration_axis, trajectory_step, repeats):
+    times = []
+    for _ in range(repeats):
+        cold = drop_cached_pages(filename)
+        start = time.perf_counter()
+        with h5py.File(filename, "r") as h5file:
+            for (parent, shape), measurements in get_measurement_batches(
+                h5file, configuration_axis
+            ).items():
+                group = h5file[parent] if parent else h5file
+                if configuration_axis in (-1, len(shape) - 1):
+                    selection = np.arange(shape[-1]) % trajectory_step == 0
+                    load_measurements(group, measurements, selection)
+                else:
+                    for measurement in measurements:
+                        group[measurement][::trajectory_step]
+        times.append(time.perf_counter() - start)
+    return min(times), cold
+
+
+def files_identical(filename, other_filename):
+    with h5py.File(filename, "r") as h5file, h5py.File(other_filename, "r") as other:
+        names = []
+        h5file.visit(names.append)
+        return all(
+            name in other
+            and (
+                not isinstance(h5file[name], h5py.Dataset)
+                or np.array_equal(h5file[name][()], other[name][()])
+            )
+            for name in names
+        )
+
+
+def main():
+    args = get_args()
+    print(
+        f"{'file':<40} {'size / MiB':>11} {'read / s':>9} "
+        f"{'ratio':>8} {'speedup':>8} {'identical':>10}"
+    )
+    for filename in args.filenames:
+        stem, extension = os.path.splitext(filename)
+        output_filename = f"{stem}{args.output_suffix}{extension}"
+        repack_file(
+            filename, output_filename, args.compression, args.configuration_axis
+        )
+
+        read_times = {}
+        for current_filename in filename, output_filename:
+            read_times[current_filename], cold = time_cold_reads(
+                current_filename,
+                args.configuration_axis,
+                args.trajectory_step,
+                args.repeats,
+            )
+        identical = files_identical(filename, output_filename)
+
+        for current_filename in filename, output_filename:
+            size = os.path.getsize(current_filename)
+            print(
+                f"{current_filename:<40} {size / 2**20:>11.2f} "
+                f"{read_times[current_filename]:>9.4f} "
+                f"{os.path.getsize(filename) / size:>8.2f} "
+                f"{read_times[filename] / read_times[current_filename]:>8.2f} "
+                f"{str(identical) if current_filename == output_filename else '-':>10}"
+            )
+        if not cold:
+            print("Page cache could not be dropped; read times may be warm.")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ metadata = pd.read_csv("metadata/ensemble_metadata.csv")
 
 def all_samples(wildcards, observables):
     return [
-        f"intermediary_data/{dir_template}/{observable}_samples.json".format(**row)
+        f"intermediary_data/{dir_template}/{observable}_samples.h5".format(**row)
         for observable in observables
         for row in metadata.to_dict(orient="records")
         if row["use_in_main_plots"]
@@ -7,7 +7,7 @@ metadata = pd.read_csv("metadata/ensemble_metadata.csv")
 
 def extp_samples(wildcards, observables):
     return [
-        f"intermediary_data/{dir_template}/{observable}_samples.json".format(**row)
+        f"intermediary_data/{dir_template}/{observable}_samples.h5".format(**row)
         for observable in observables
         for row in metadata.to_dict(orient="records")
         if row["use_in_main_plots"]
@@ -15,73 +15,93 @@ def extp_samples(wildcards, observables):
     ]
 
 
-rule Mass_continuum_massless_extrapolation:
+mass_extrapolation_observables = [
+    "w0",
+    "smear_meson_ps",
+    "smear_meson_v",
+    "smear_meson_t",
+    "smear_meson_av",
+    "smear_meson_at",
+    "smear_meson_s",
+    "gevp_smear_meson_rhoE1",
+]
+decay_extrapolation_observables = [
+    "w0",
+    "meson_ps",
+    "decay_constant_ps",
+    "decay_constant_v",
+    "decay_constant_av",
+]
+ratio_extrapolation_observables = ["w0", "meson_ps", "meson_v", "decay_constant_ps"]
+
+
+rule consolidate_extrapolation_samples:
     params:
         module=lambda wildcards, input: input.script.replace("/", ".")[:-3],
     input:
         data=partial(
             extp_samples,
-            observables=[
-                "w0",
-                "smear_meson_ps",
-                "smear_meson_v",
-                "smear_meson_t",
-                "smear_meson_av",
-                "smear_meson_at",
-                "smear_meson_s",
-                "gevp_smear_meson_rhoE1",
-            ],
+            observables=sorted(
+                set(mass_extrapolation_observables)
+                | set(decay_extrapolation_observables)
+                | set(ratio_extrapolation_observables)
+            ),
         ),
+        script="src/consolidate_samples.py",
+    output:
+        store="intermediary_data/extrapolation_results/sample_store.h5",
+    conda:
+        "../envs/flow_analysis.yml"
+    shell:
+        "python -m {params.module} {output.store} {input.data}"
+
+
+rule Mass_continuum_massless_extrapolation:
+    params:
+        module=lambda wildcards, input: input.script.replace("/", ".")[:-3],
+        observables=mass_extrapolation_observables,
+    input:
+        data="intermediary_data/extrapolation_results/sample_store.h5",
         script="src/extrapolation_mass.py",
     output:
         mean=f"intermediary_data/extrapolation_results/{{channel}}_extp_mass_mean.csv",
-        samples=f"intermediary_data/extrapolation_results/{{channel}}_extp_mass_samples.json",
+        samples=f"intermediary_data/extrapolation_results/{{channel}}_extp_mass_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
-        "python -m {params.module} {input.data} --output_file_mean {output.mean} --output_file_samples {output.samples} --channel {wildcards.channel}"
+        "python -m {params.module} {input.data} --store_observables {params.observables} --output_file_mean {output.mean} --output_file_samples {output.samples} --channel {wildcards.channel}"
 
 
 rule Decay_continuum_massless_extrapolation:
     params:
         module=lambda wildcards, input: input.script.replace("/", ".")[:-3],
+        observables=decay_extrapolation_observables,
     input:
-        data=partial(
-            extp_samples,
-            observables=[
-                "w0",
-                "meson_ps",
-                "decay_constant_ps",
-                "decay_constant_v",
-                "decay_constant_av",
-            ],
-        ),
+        data="intermediary_data/extrapolation_results/sample_store.h5",
         script="src/extrapolation_decay.py",
     output:
         mean=f"intermediary_data/extrapolation_results/{{channel}}_extp_decayconstant_mean.csv",
-        samples=f"intermediary_data/extrapolation_results/{{channel}}_extp_decay_samples.json",
+        samples=f"intermediary_data/extrapolation_results/{{channel}}_extp_decay_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
-        "python -m {params.module} {input.data} --output_file_mean {output.mean} --output_file_samples {output.samples} --channel {wildcards.channel}"
+        "python -m {params.module} {input.data} --store_observables {params.observables} --output_file_mean {output.mean} --output_file_samples {output.samples} --channel {wildcards.channel}"
 
 
 rule Ratio_continuum_massless_extrapolation:
     params:
         module=lambda wildcards, input: input.script.replace("/", ".")[:-3],
+        observables=ratio_extrapolation_observables,
     input:
-        data=partial(
-            extp_samples,
-            observables=["w0", "meson_ps", "meson_v", "decay_constant_ps"],
-        ),
+        data="intermediary_data/extrapolation_results/sample_store.h5",
         script="src/extrapolation_ratio.py",
     output:
         mean=f"intermediary_data/extrapolation_results/R_m{{channel}}dfps_extp_mean.csv",
-        samples=f"intermediary_data/extrapolation_results/R_m{{channel}}dfps_extp_samples.json",
+        samples=f"intermediary_data/extrapolation_results/R_m{{channel}}dfps_extp_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
-        "python -m {params.module} {input.data} --output_file_mean {output.mean} --output_file_samples {output.samples} --channel {wildcards.channel}"
+        "python -m {params.module} {input.data} --store_observables {params.observables} --output_file_mean {output.mean} --output_file_samples {output.samples} --channel {wildcards.channel}"
 
 
 rule Chipt_extrapolation:
@@ -92,7 +112,7 @@ rule Chipt_extrapolation:
         script="src/extrapolation_chipt.py",
     output:
         mean=f"intermediary_data/chipt_extrapolation_results/chipt_b{{beta}}_extp_mean.csv",
-        samples=f"intermediary_data/chipt_extrapolation_results/chipt_b{{beta}}_extp_samples.json",
+        samples=f"intermediary_data/chipt_extrapolation_results/chipt_b{{beta}}_extp_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
@@ -109,7 +129,7 @@ rule DEFT_extrapolation:
         script="src/extrapolation_deft.py",
     output:
         mean=f"intermediary_data/deft_extrapolation_results/deft_b{{beta}}_extp_mean.csv",
-        samples=f"intermediary_data/deft_extrapolation_results/deft_b{{beta}}_extp_samples.json",
+        samples=f"intermediary_data/deft_extrapolation_results/deft_b{{beta}}_extp_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
@@ -120,8 +140,8 @@ rule Chipt_ratio_indirect:
     params:
         module=lambda wildcards, input: input.script.replace("/", ".")[:-3],
     input:
-        ps_decay="intermediary_data/extrapolation_results/ps_extp_decay_samples.json",
-        v_mass="intermediary_data/extrapolation_results/v_extp_mass_samples.json",
+        ps_decay="intermediary_data/extrapolation_results/ps_extp_decay_samples.h5",
+        v_mass="intermediary_data/extrapolation_results/v_extp_mass_samples.h5",
         script="src/definitions/mvhat_over_fpshat_chiral.py",
     output:
         definitions="assets/definitions/chipt_ratio_indirect.tex",
@@ -135,7 +155,7 @@ rule Chipt_ratio_direct:
     params:
         module=lambda wildcards, input: input.script.replace("/", ".")[:-3],
     input:
-        data="intermediary_data/extrapolation_results/R_mvdfps_extp_samples.json",
+        data="intermediary_data/extrapolation_results/R_mvdfps_extp_samples.h5",
         script="src/definitions/mv_over_fps_chiral.py",
     output:
         definitions="assets/definitions/chipt_ratio_direct.tex",
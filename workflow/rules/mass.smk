@@ -44,7 +44,7 @@ rule fit_mass_wall:
         script="src/mass_wall.py",
     output:
         mean=f"intermediary_data/{dir_template}/meson_{{channel}}_mean.csv",
-        samples=f"intermediary_data/{dir_template}/meson_{{channel}}_samples.json",
+        samples=f"intermediary_data/{dir_template}/meson_{{channel}}_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
@@ -67,7 +67,7 @@ rule fit_mass_smear:
         script="src/mass_smear.py",
     output:
         mean=f"intermediary_data/{dir_template}/smear_meson_{{channel}}_mean.csv",
-        samples=f"intermediary_data/{dir_template}/smear_meson_{{channel}}_samples.json",
+        samples=f"intermediary_data/{dir_template}/smear_meson_{{channel}}_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
@@ -83,7 +83,7 @@ rule fit_mass_GEVP_rhoE1:
         script="src/mass_gevp.py",
     output:
         mean=f"intermediary_data/{dir_template}/gevp_smear_meson_rhoE1_mean.csv",
-        samples=f"intermediary_data/{dir_template}/gevp_smear_meson_rhoE1_samples.json",
+        samples=f"intermediary_data/{dir_template}/gevp_smear_meson_rhoE1_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
@@ -92,8 +92,8 @@ rule fit_mass_GEVP_rhoE1:
 
 def mass_samples(wildcards):
     return [
-        f"intermediary_data/{dir_template}/meson_{wildcards.channel}_samples.json",
-        f"intermediary_data/{dir_template}/plaquette_samples.json",
+        f"intermediary_data/{dir_template}/meson_{wildcards.channel}_samples.h5",
+        f"intermediary_data/{dir_template}/plaquette_samples.h5",
     ]
 
 
@@ -105,7 +105,7 @@ rule get_meson_decay:
         script="src/decay_constant.py",
     output:
         mean=f"intermediary_data/{dir_template}/decay_constant_{{channel}}_mean.csv",
-        samples=f"intermediary_data/{dir_template}/decay_constant_{{channel}}_samples.json",
+        samples=f"intermediary_data/{dir_template}/decay_constant_{{channel}}_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
@@ -114,8 +114,8 @@ rule get_meson_decay:
 
 def ratio_fps_samples(wildcards):
     return [
-        f"intermediary_data/{dir_template}/decay_constant_ps_samples.json",
-        f"intermediary_data/{dir_template}/meson_{wildcards.channel}_samples.json",
+        f"intermediary_data/{dir_template}/decay_constant_ps_samples.h5",
+        f"intermediary_data/{dir_template}/meson_{wildcards.channel}_samples.h5",
     ]
 
 
@@ -127,7 +127,7 @@ rule get_fps_ratio:
         script="src/get_Rfps.py",
     output:
         mean=f"intermediary_data/{dir_template}/Rfps_{{channel}}_mean.csv",
-        samples=f"intermediary_data/{dir_template}/Rfps_{{channel}}_samples.json",
+        samples=f"intermediary_data/{dir_template}/Rfps_{{channel}}_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
@@ -136,22 +136,22 @@ rule get_fps_ratio:
 
 def ratio_fps_smear_samples(wildcards):
     return [
-        f"intermediary_data/{dir_template}/decay_constant_ps_samples.json",
-        f"intermediary_data/{dir_template}/smear_meson_{wildcards.channel}_samples.json",
+        f"intermediary_data/{dir_template}/decay_constant_ps_samples.h5",
+        f"intermediary_data/{dir_template}/smear_meson_{wildcards.channel}_samples.h5",
     ]
 
 
 def ratio_fps_rhoE1_samples(wildcards):
     return [
-        f"intermediary_data/{dir_template}/decay_constant_ps_samples.json",
-        f"intermediary_data/{dir_template}/gevp_smear_meson_rhoE1_samples.json",
+        f"intermediary_data/{dir_template}/decay_constant_ps_samples.h5",
+        f"intermediary_data/{dir_template}/gevp_smear_meson_rhoE1_samples.h5",
     ]
 
 
 def ratio_mv_rhoE1_samples(wildcards):
     return [
-        f"intermediary_data/{dir_template}/smear_meson_v_samples.json",
-        f"intermediary_data/{dir_template}/gevp_smear_meson_rhoE1_samples.json",
+        f"intermediary_data/{dir_template}/smear_meson_v_samples.h5",
+        f"intermediary_data/{dir_template}/gevp_smear_meson_rhoE1_samples.h5",
     ]
 
 
@@ -163,7 +163,7 @@ rule get_fps_smear_meson_ratio:
         script="src/get_Rfps.py",
     output:
         mean=f"intermediary_data/{dir_template}/smear_Rfps_{{channel}}_mean.csv",
-        samples=f"intermediary_data/{dir_template}/smear_Rfps_{{channel}}_samples.json",
+        samples=f"intermediary_data/{dir_template}/smear_Rfps_{{channel}}_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
@@ -178,7 +178,7 @@ rule get_fps_smear_rhoE1_ratio:
         script="src/get_Rfps.py",
     output:
         mean=f"intermediary_data/{dir_template}/gevp_smear_Rfps_rhoE1_mean.csv",
-        samples=f"intermediary_data/{dir_template}/gevp_smear_Rfps_rhoE1_samples.json",
+        samples=f"intermediary_data/{dir_template}/gevp_smear_Rfps_rhoE1_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
@@ -193,7 +193,7 @@ rule get_Rmv_smear_rhoE1_ratio:
         script="src/get_Rmv.py",
     output:
         mean=f"intermediary_data/{dir_template}/gevp_smear_Rmv_rhoE1_mean.csv",
-        samples=f"intermediary_data/{dir_template}/gevp_smear_Rmv_rhoE1_samples.json",
+        samples=f"intermediary_data/{dir_template}/gevp_smear_Rmv_rhoE1_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
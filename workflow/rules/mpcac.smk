@@ -13,7 +13,7 @@ rule fit_pcac:
         script="src/mpcac.py",
     output:
         mean=f"intermediary_data/{dir_template}/mpcac_mean.csv",
-        samples=f"intermediary_data/{dir_template}/mpcac_samples.json",
+        samples=f"intermediary_data/{dir_template}/mpcac_samples.h5",
         plot=f"intermediary_data/{dir_template}/pcac_eff_mass.pdf",
     conda:
         "../envs/flow_analysis.yml"
@@ -12,7 +12,7 @@ rule avg_plaquette:
         Ns=r"\d+",
     output:
         mean=f"intermediary_data/{dir_template}/plaquette_mean.csv",
-        samples=f"intermediary_data/{dir_template}/plaquette_samples.json",
+        samples=f"intermediary_data/{dir_template}/plaquette_samples.h5",
     conda:
         "../envs/flow_analysis.yml"
     shell:
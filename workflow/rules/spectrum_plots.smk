@@ -7,7 +7,7 @@ spectrum_plot_target_beta = 6.7
 
 def all_samples(wildcards, observables):
     return [
-        f"intermediary_data/{dir_template}/{observable}_samples.json".format(**row)
+        f"intermediary_data/{dir_template}/{observable}_samples.h5".format(**row)
         for observable in observables
         for row in metadata.to_dict(orient="records")
         if row["use_in_main_plots"]
@@ -16,7 +16,7 @@ def all_samples(wildcards, observables):
 
 def extp_samples(wildcards, observables):
     return [
-        f"intermediary_data/{dir_template}/{observable}_samples.json".format(**row)
+        f"intermediary_data/{dir_template}/{observable}_samples.h5".format(**row)
         for observable in observables
         for row in metadata.to_dict(orient="records")
         if row["use_in_extrapolation"]
@@ -25,7 +25,7 @@ def extp_samples(wildcards, observables):
 
 def mass_extp(wildcards, observables):
     return [
-        f"intermediary_data/extrapolation_results/{observable}_samples.json".format(
+        f"intermediary_data/extrapolation_results/{observable}_samples.h5".format(
             **row
         )
         for observable in observables
@@ -37,21 +37,21 @@ def mass_extp(wildcards, observables):
 
 def chipt_extp(wildcards):
     return [
-        f"intermediary_data/chipt_extrapolation_results/chipt_b{beta}_extp_samples.json"
+        f"intermediary_data/chipt_extrapolation_results/chipt_b{beta}_extp_samples.h5"
         for beta in [6.6, 6.65, 6.7, 6.75, 6.8]
     ]
 
 
 def deft_extp(wildcards):
     return [
-        f"intermediary_data/deft_extrapolation_results/deft_b{beta}_extp_samples.json"
+        f"intermediary_data/deft_extrapolation_results/deft_b{beta}_extp_samples.h5"
         for beta in [6.6, 6.65, 6.7, 6.75, 6.8]
     ]
 
 
 def volume_samples(wildcards, observables):
     return [
-        f"intermediary_data/{dir_template}/{observable}_samples.json".format(**row)
+        f"intermediary_data/{dir_template}/{observable}_samples.h5".format(**row)
         for observable in observables
         for row in metadata.to_dict(orient="records")
         if row["use_in_finite_volume"]
@@ -60,7 +60,7 @@ def volume_samples(wildcards, observables):
 
 def target_beta_samples(wildcards, observables):
     return [
-        f"intermediary_data/{dir_template}/{observable}_samples.json".format(**row)
+        f"intermediary_data/{dir_template}/{observable}_samples.h5".format(**row)
         for observable in observables
         for row in metadata.to_dict(orient="records")
         if row["beta"] == spectrum_plot_target_beta
@@ -290,7 +290,7 @@ rule plot_R_mvfps_vs_mps:
             observables=["meson_ps", "meson_v", "w0", "decay_constant_ps"],
         ),
         external_data="external_data/mv_fps_fund.csv",
-        fit_results="intermediary_data/extrapolation_results/R_mvdfps_extp_samples.json",
+        fit_results="intermediary_data/extrapolation_results/R_mvdfps_extp_samples.h5",
         script="src/plots/R_mvfps_vs_mps.py",
     output:
         plot="assets/plots/mvfps_vs_m2ps_GF_F_vs_AS.{plot_filetype}",